@@ -0,0 +1,139 @@
+import threading
+
+from sys import maxsize
+
+import numpy
+
+from ECAgent.Collectors import Collector
+
+
+class DoubleBuffer:
+    """Hands snapshots from the simulation thread to ``consumer``, which runs on a background thread, through two slots.
+    While the consumer processes the snapshot in one slot, the simulation fills the other, so publish() only blocks
+    when the consumer is a whole snapshot behind. Snapshots are processed in the order they were published.
+
+    Arrays are copied into buffers that each slot allocates once (and again if their shape or dtype changes), so the
+    consumer must not keep references to them once it returns. Any other value is passed on as is and must not be
+    modified by the simulation afterwards. An exception raised by the consumer stops the worker and is re-raised by the
+    next call to publish() or drain()."""
+
+    def __init__(self, consumer):
+        self.consumer = consumer
+        self.buffers = [{}, {}]
+        self.slots = [None, None]
+        self.write = 0
+        self.read = 0
+        self.error = None
+        self.closed = False
+        self.condition = threading.Condition()
+
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def publish(self, snapshot: dict):
+        """Copies ``snapshot`` into the free slot and hands it to the consumer."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.slots[self.write] is None or self.error is not None)
+            self.raise_error()
+
+        # The consumer never reads an empty slot so it is filled without holding the lock
+        buffers = self.buffers[self.write]
+        slot = {}
+        for name, value in snapshot.items():
+            if isinstance(value, numpy.ndarray):
+                buffer = buffers.get(name)
+                if buffer is None or buffer.shape != value.shape or buffer.dtype != value.dtype:
+                    buffer = buffers[name] = numpy.empty_like(value)
+                numpy.copyto(buffer, value)
+                slot[name] = buffer
+            else:
+                slot[name] = value
+
+        with self.condition:
+            self.slots[self.write] = slot
+            self.write ^= 1
+            self.condition.notify_all()
+
+    def work(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.slots[self.read] is not None or self.closed)
+                slot = self.slots[self.read]
+                if slot is None:
+                    return
+
+            try:
+                self.consumer(slot)
+            except BaseException as error:
+                with self.condition:
+                    self.error = error
+                    self.condition.notify_all()
+                return
+
+            with self.condition:
+                self.slots[self.read] = None
+                self.read ^= 1
+                self.condition.notify_all()
+
+    def drain(self):
+        """Blocks until every published snapshot has been processed."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.slots == [None, None] or self.error is not None)
+            self.raise_error()
+
+    def close(self):
+        """Drains the buffer and stops the worker."""
+        try:
+            self.drain()
+        finally:
+            with self.condition:
+                self.closed = True
+                self.condition.notify_all()
+            self.thread.join()
+
+
+class AsyncCollector(Collector):
+    """A Collector whose collection is split in two:
+        - snapshot() runs on the simulation thread and returns the (cheap to copy) model state the collector needs as a
+          dict of arrays and scalars, or None if there is nothing to process this step.
+        - process(snapshot) does the expensive work (aggregation, metrics, images, file writes) on that state.
+    If ``asynchronous`` is True, snapshots are published to a DoubleBuffer and process() runs on a background thread,
+    so the simulation only pays for the snapshot. Records appended by process() keep the order of the steps but lag
+    behind the model, call wait() before reading them and close() once the run is over. Otherwise process() runs
+    straight after snapshot() on the views it returned, like a regular Collector.
+
+    Records that stop conditions read every step should be appended by snapshot() so they never lag."""
+
+    def __init__(self, id: str, model, asynchronous: bool = False, priority=-1, frequency=1, start=0, end=maxsize):
+        super().__init__(id, model, priority, frequency, start, end)
+        self.buffer = DoubleBuffer(self.process) if asynchronous else None
+
+    def collect(self):
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return
+
+        if self.buffer is not None:
+            self.buffer.publish(snapshot)
+        else:
+            self.process(snapshot)
+
+    def snapshot(self) -> dict:
+        return None
+
+    def process(self, snapshot: dict):
+        pass
+
+    def wait(self):
+        """Blocks until every snapshot taken so far has been processed."""
+        if self.buffer is not None:
+            self.buffer.drain()
+
+    def close(self):
+        """Processes the remaining snapshots and stops the background thread."""
+        if self.buffer is not None:
+            self.buffer.close()
@@ -0,0 +1,24 @@
+import functools
+import importlib.util
+
+# Numba is an optional dependency. Without it the kernels of the models are plain python functions and the models fall
+# back to their python backend.
+NUMBA_AVAILABLE = importlib.util.find_spec('numba') is not None
+
+
+def jit(func):
+    """Compiles ``func`` with numba the first time it is called, so that numba is only imported by runs that use the
+    numba backend."""
+    if not NUMBA_AVAILABLE:
+        return func
+
+    compiled = []
+
+    @functools.wraps(func)
+    def dispatch(*args):
+        if len(compiled) == 0:
+            from numba import njit
+            compiled.append(njit(cache=True)(func))
+        return compiled[0](*args)
+
+    return dispatch
@@ -0,0 +1,224 @@
+import collections
+import hmac
+import json
+import os
+import shutil
+import socket
+import socketserver
+import threading
+import time
+
+import numpy
+import pandas
+
+from RecordSink import RecordSink
+from Scheduler import Ledger, Scheduler, run_job
+
+# Per-step records streamed back by the workers for each model: (column dtypes, record of the last step)
+RECORDS = {
+    'ants': ({'collected': numpy.int64},
+             lambda model: {'collected': int(model.systemManager.systems['collector'].records[-1])}),
+    'predator-prey': ({'sheep': numpy.int64, 'wolves': numpy.int64},
+                      lambda model: {'sheep': int(model.systemManager.systems['collector'].records['sheep'][-1]),
+                                     'wolves': int(model.systemManager.systems['collector'].records['wolves'][-1])}),
+    'segregation': ({'moved': numpy.int64},
+                    lambda model: {'moved': int(model.systemManager.systems['move'].moved)})
+}
+
+# Seconds a client has to send its 'hello' message after connecting
+HELLO_TIMEOUT = 10.0
+
+
+def send(stream, message: dict):
+    """Writes ``message`` to ``stream`` as a single line of JSON."""
+    stream.write((json.dumps(message, default=str) + '\n').encode())
+    stream.flush()
+
+
+def receive(stream) -> dict:
+    """Reads the next message from ``stream``. Raises a ConnectionError if the other end closed the connection."""
+    line = stream.readline()
+    if not line:
+        raise ConnectionError('Connection closed.')
+    return json.loads(line)
+
+
+class Coordinator(Scheduler):
+    """Runs the jobs of an experiment spec (see Scheduler.expand()) on workers that connect over TCP, see work().
+
+    Messages are lines of JSON. A worker introduces itself with a 'hello' holding the coordinator's ``token``, then
+    receives one 'job' at a time. While a job runs, the worker streams the records of its steps back in 'records'
+    messages (see RECORDS), which the coordinator writes to ``directory/records/<job id>`` with a RecordSink, and ends
+    it with a 'result' message. Once no job is left, workers receive a 'stop' message.
+
+    Results go to the same ledger as the Scheduler's, so a sweep can be resumed by either. Jobs of a worker that
+    disconnects are handed to the next worker that asks for one. Jobs that fail are reported and left out of the ledger
+    so they are retried on the next run. Port 0 picks a free port, see ``address``. stop() (called when run() is
+    interrupted, e.g. by Ctrl+C) stops handing out jobs: workers are told to quit once their current job is done."""
+
+    def __init__(self, spec: dict, directory: str, host: str = '127.0.0.1', port: int = 0, token: str = ''):
+        super().__init__(spec, directory, workers=0)
+        self.token = token
+        self.queue = collections.deque()
+        self.remaining = 0
+        self.done = 0
+        self.stopped = False
+        self.ledger = None
+        self.condition = threading.Condition()
+
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def handle(self):
+                coordinator.serve(self.request, self.rfile, self.wfile)
+
+        # Handler threads are joined when the server closes, so every waiting worker is sent its 'stop' message
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self.address = self.server.server_address
+
+    def run(self) -> pandas.DataFrame:
+        """Serves jobs until every job that is not in the ledger yet has completed or failed (or until stop() is called)
+        and returns the results of every job of the spec that has completed, in the order of the spec."""
+        self.ledger = Ledger(os.path.join(self.directory, 'ledger.jsonl'))
+        pending = [job for job in self.jobs if job['id'] not in self.ledger]
+        self.queue.extend(pending)
+        self.remaining = len(pending)
+        print('{} jobs, {} already completed, serving {} on {}:{}...'.format(len(self.jobs),
+                                                                            len(self.jobs) - len(pending),
+                                                                            len(pending), *self.address))
+
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        try:
+            with self.condition:
+                self.condition.wait_for(lambda: self.remaining == 0 or self.stopped)
+        finally:
+            # Handlers are joined when the server closes, so they must stop waiting for jobs first
+            self.stop()
+            self.server.shutdown()
+            self.server.server_close()
+            with self.condition:
+                self.ledger.close()
+
+        return self.results(self.ledger)
+
+    def stop(self):
+        """Stops handing out jobs and makes run() return once the jobs that are running have completed."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def next_job(self) -> dict:
+        """Blocks until a job is queued, and returns it, or until every job is done or the coordinator is stopped, and
+        returns None."""
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.queue) > 0 or self.remaining == 0 or self.stopped)
+            return self.queue.popleft() if self.remaining > 0 and not self.stopped else None
+
+    def serve(self, connection: socket.socket, rfile, wfile):
+        """Hands jobs to the worker connected through ``rfile`` and ``wfile`` until there are none left."""
+        # Do not wait forever on a client that never introduces itself
+        connection.settimeout(HELLO_TIMEOUT)
+        try:
+            hello = receive(rfile)
+        except (OSError, ValueError):
+            return
+        connection.settimeout(None)
+
+        if hello.get('type') != 'hello' or not hmac.compare_digest(str(hello.get('token', '')), self.token):
+            send(wfile, {'type': 'stop', 'reason': 'Invalid token.'})
+            return
+        worker = hello.get('worker', '{}:{}'.format(*connection.getpeername()[:2]))
+
+        while True:
+            job = self.next_job()
+            if job is None:
+                send(wfile, {'type': 'stop'})
+                return
+
+            records = os.path.join(self.directory, 'records')
+            shutil.rmtree(os.path.join(records, job['id']), ignore_errors=True)
+            sink = RecordSink(records, RECORDS[job['model']][0], run_id=job['id'], seed=job['seed'],
+                              params=job['params'])
+            try:
+                send(wfile, {'type': 'job', 'job': job})
+                while True:
+                    message = receive(rfile)
+                    if message['type'] == 'records':
+                        for record in message['records']:
+                            sink.append(record)
+                    elif message['type'] == 'result':
+                        break
+                sink.close()
+            except (OSError, ValueError, KeyError):
+                # The worker is gone (or broke the protocol), so its job goes back to the queue
+                shutil.rmtree(sink.directory, ignore_errors=True)
+                with self.condition:
+                    self.queue.appendleft(job)
+                    self.condition.notify_all()
+                print('Worker {} disconnected, job {} requeued'.format(worker, job['id']))
+                return
+
+            self.complete(job, dict(message['result'], worker=worker), sink)
+
+    def complete(self, job: dict, result: dict, sink: RecordSink):
+        with self.condition:
+            if 'error' in result:
+                shutil.rmtree(sink.directory, ignore_errors=True)
+                self.failures.append(result)
+                print('Job {} failed on {}:\n{}'.format(job['id'], result['worker'], result['error']))
+            else:
+                self.ledger.record(result)
+
+            self.remaining -= 1
+            self.done += 1
+            print('Completed {}/{} jobs'.format(self.done, self.done + self.remaining))
+            self.condition.notify_all()
+
+
+def connect(host: str, port: int, retry: float) -> socket.socket:
+    """Connects to the coordinator at host:port, retrying for ``retry`` seconds so that workers can be started first."""
+    deadline = time.monotonic() + retry
+    while True:
+        try:
+            return socket.create_connection((host, port))
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+def work(host: str, port: int, token: str = '', name: str = None, batch: int = 100, retry: float = 30.0) -> int:
+    """Runs jobs handed out by the Coordinator at host:port until it has none left and returns the number of jobs
+    run. Records are sent back every ``batch`` steps and when a run ends."""
+    name = name if name is not None else '{}-{}'.format(socket.gethostname(), os.getpid())
+
+    with connect(host, port, retry) as connection, connection.makefile('rwb') as stream:
+        send(stream, {'type': 'hello', 'token': token, 'worker': name})
+
+        jobs = 0
+        while True:
+            message = receive(stream)
+            if message['type'] == 'stop':
+                if 'reason' in message:
+                    raise ConnectionError('Coordinator refused {}: {}'.format(name, message['reason']))
+                return jobs
+
+            job = message['job']
+            record = RECORDS[job['model']][1]
+            records = []
+
+            def step(model):
+                records.append(record(model))
+                if len(records) >= batch:
+                    send(stream, {'type': 'records', 'records': records})
+                    records.clear()
+
+            result = run_job(job, step)
+            if len(records) > 0:
+                send(stream, {'type': 'records', 'records': records})
+            send(stream, {'type': 'result', 'result': result})
+            jobs += 1
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import tempfile
+
+import numpy
+import pandas
+
+from ECAgent.Environments import Environment, GridWorld
+
+
+class LayerStore:
+    """Per-cell layers of a GridWorld stored as contiguous, typed numpy buffers.
+
+    Cells are indexed the same way as ``GridWorld.cells`` (``discreteGridPosToID(x, y, width)``). ``store[name]`` returns
+    the buffer of a layer itself, so systems update layers in place rather than copying them out of and back into the
+    GridWorld's DataFrame every step. Assigning to ``store[name]`` copies the values into the existing buffer.
+
+    If ``directory`` is supplied, layers are memory-mapped instead of held in memory: images are converted once into
+    float32 ``.npy`` files cached in ``directory`` (see add_image()) and every other buffer is backed by a scratch file
+    in it, so the operating system pages cells in and out as they are used and the resident memory of a model is bounded
+    by the cells it touches rather than the size of the grid."""
+
+    def __init__(self, width: int, height: int, directory: str = None):
+        self.width = width
+        self.height = height
+        self.directory = directory
+        self.layers = {}
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.layers
+
+    def __getitem__(self, name: str) -> numpy.ndarray:
+        return self.layers[name]
+
+    def __setitem__(self, name: str, values):
+        self.layers[name][:] = values
+
+    def zeros(self, shape, dtype=numpy.float64) -> numpy.ndarray:
+        """Returns a zeroed array, backed by an (already unlinked) scratch file if the store has a directory."""
+        if self.directory is None:
+            return numpy.zeros(shape, dtype=dtype)
+
+        with tempfile.TemporaryFile(dir=self.directory) as file:
+            return numpy.asarray(numpy.memmap(file, dtype=dtype, mode='w+', shape=shape))
+
+    def add(self, name: str, values, dtype=numpy.float64) -> numpy.ndarray:
+        """Adds a layer initialised (and copied) from ``values`` and returns its buffer."""
+        buffer = self.zeros(self.width * self.height, dtype)
+        buffer[:] = numpy.reshape(values, self.width * self.height)
+        self.layers[name] = buffer
+        return buffer
+
+    def attach(self, name: str, buffer: numpy.ndarray) -> numpy.ndarray:
+        """Adds a layer backed by ``buffer`` itself (e.g. a view of a larger array) rather than a copy of it."""
+        if buffer.shape != (self.width * self.height,):
+            raise ValueError('Layer \'{}\' must have {} cells.'.format(name, self.width * self.height))
+
+        self.layers[name] = buffer
+        return buffer
+
+    def add_image(self, name: str, path: str, transform, key: str = '') -> numpy.ndarray:
+        """Adds a read-only layer holding ``transform(pixels)``, where ``pixels`` are the greyscale values (0-255) of the
+        image at ``path``, and returns its buffer.
+
+        Without a directory, this is the same as add(name, transform(pixels)). Otherwise the converted values are
+        written as float32 to a ``.npy`` file in the directory the first time and memory-mapped from then on. Cached
+        files are keyed by the image's path, size and modification time as well as ``key``, which must identify
+        ``transform`` (e.g. its parameters)."""
+        if self.directory is None:
+            return self.add(name, transform(read_image(path, self.width, self.height)))
+
+        stat = os.stat(path)
+        digest = hashlib.sha1('{}:{}:{}:{}'.format(os.path.abspath(path), stat.st_size, stat.st_mtime_ns,
+                                                   key).encode()).hexdigest()
+        cached = os.path.join(self.directory, '{}-{}.npy'.format(os.path.basename(path), digest[:16]))
+
+        if not os.path.exists(cached):
+            pixels = read_image(path, self.width, self.height)
+            # Write to a temporary file first so that other processes never map a partially converted layer
+            converted = numpy.lib.format.open_memmap(cached + '.tmp', mode='w+', dtype=numpy.float32,
+                                                     shape=pixels.shape)
+            for start in range(0, len(pixels), 1 << 22):
+                converted[start:start + (1 << 22)] = transform(pixels[start:start + (1 << 22)])
+            converted.flush()
+            del converted
+            os.replace(cached + '.tmp', cached)
+
+        return self.attach(name, numpy.asarray(numpy.load(cached, mmap_mode='r')))
+
+    def grid(self, name: str) -> numpy.ndarray:
+        """Returns a (height, width) view of a layer, so that ``store.grid(name)[y, x]`` is the value of cell (x, y)."""
+        return self.layers[name].reshape(self.height, self.width)
+
+    def to_frame(self, names: [str] = None) -> pandas.DataFrame:
+        """Returns a copy of the layers (all of them by default) as a DataFrame laid out like ``GridWorld.cells``. Meant
+        for exporting layers, not for use inside systems."""
+        frame = pandas.DataFrame({'pos': [(x, y) for y in range(self.height) for x in range(self.width)]})
+        for name in names if names is not None else self.layers:
+            frame[name] = self.layers[name].copy()
+        return frame
+
+
+def read_image(path: str, width: int, height: int) -> numpy.ndarray:
+    """Returns the greyscale values (0-255) of the image at ``path`` as a flat uint8 array of ``width`` x ``height``
+    cells."""
+    from PIL import Image
+
+    # Maps may be far larger than PIL's decompression bomb limit
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        with Image.open(path) as image:
+            pixels = numpy.asarray(image.convert('L'))
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+    if pixels.shape != (height, width):
+        raise ValueError('Image \'{}\' is {}x{} but the grid is {}x{}.'.format(path, pixels.shape[1], pixels.shape[0],
+                                                                              width, height))
+    return pixels.reshape(-1)
+
+
+class LayeredGridWorld(GridWorld):
+    """A GridWorld whose cells only live in a LayerStore. GridWorld builds a DataFrame with a row for every cell, which
+    this skips (``cells`` is left empty) so that grids can be as large as their layers allow."""
+
+    def __init__(self, width: int, height: int, model, id: str = 'ENVIRONMENT'):
+        if width < 1 or height < 1:
+            raise Exception("Cannot create a GridWorld with a negative width or height.")
+
+        Environment.__init__(self, model, id=id)
+        self.width = width
+        self.height = height
+        self.cells = pandas.DataFrame({'pos': []})
@@ -0,0 +1,72 @@
+import zlib
+
+import numpy
+
+
+class PrefetchBuffer:
+    """Serves scalar draws out of a buffer of ``size`` uniform values that is refilled from ``generator`` in bulk, which
+    avoids a call into the Generator for every draw. Offers the subset of the ``random.Random`` interface the models
+    use."""
+
+    def __init__(self, generator: numpy.random.Generator, size: int = 4096):
+        self.generator = generator
+        self.values = generator.random(size)
+        self.position = 0
+
+    def random(self) -> float:
+        """Returns a uniform float in [0, 1)."""
+        if self.position == len(self.values):
+            self.generator.random(out=self.values)
+            self.position = 0
+
+        value = self.values[self.position]
+        self.position += 1
+        return float(value)
+
+    def randrange(self, n: int) -> int:
+        """Returns a uniform integer in [0, n)."""
+        return int(self.random() * n)
+
+    def choice(self, seq):
+        """Returns a uniformly drawn element of the non-empty sequence ``seq``."""
+        return seq[self.randrange(len(seq))]
+
+
+class RandomStreams:
+    """Independent numpy random streams derived from a single seed.
+
+    Every stream is identified by a name (e.g. the id of the system that uses it) and seeded from a child of the
+    model's SeedSequence keyed by that name, so a stream only depends on the seed and its name and not on the order in
+    which streams are created. spawn() derives any number of independent child RandomStreams, e.g. one per replicate or
+    per unit of parallel work. As long as work is split into the same units, results are the same whichever worker
+    processes them."""
+
+    def __init__(self, seed, sequence: numpy.random.SeedSequence = None):
+        self.sequence = sequence if sequence is not None else numpy.random.SeedSequence(seed)
+        self.children = {}
+        self.generators = {}
+        self.buffers = {}
+
+    def child(self, name: str) -> numpy.random.SeedSequence:
+        """Returns the SeedSequence of stream ``name``."""
+        if name not in self.children:
+            self.children[name] = numpy.random.SeedSequence(
+                self.sequence.entropy, spawn_key=self.sequence.spawn_key + (zlib.crc32(name.encode()),))
+        return self.children[name]
+
+    def stream(self, name: str) -> numpy.random.Generator:
+        """Returns the Generator of stream ``name`` for bulk draws."""
+        if name not in self.generators:
+            self.generators[name] = numpy.random.default_rng(self.child(name))
+        return self.generators[name]
+
+    def buffered(self, name: str, size: int = 4096) -> PrefetchBuffer:
+        """Returns a PrefetchBuffer over stream ``name`` for scalar draws. The buffer draws from its own stream,
+        distinct from stream(name)."""
+        if name not in self.buffers:
+            self.buffers[name] = PrefetchBuffer(self.stream(name + '/buffered'), size)
+        return self.buffers[name]
+
+    def spawn(self, name: str, n: int) -> ['RandomStreams']:
+        """Returns ``n`` independent RandomStreams derived from stream ``name``. Repeated calls return new streams."""
+        return [RandomStreams(None, sequence) for sequence in self.child(name).spawn(n)]
@@ -0,0 +1,171 @@
+import json
+import os
+import uuid
+
+import numpy
+import pandas
+
+
+class Column:
+    """A column of a RecordSink. Columns behave like the lists collectors keep their records in: values are appended
+    with append(), ``column[i]`` returns a single value (``column[-1]`` being the latest) and numpy.asarray(column)
+    returns every value appended so far, reading flushed chunks back from disk."""
+
+    def __init__(self, sink, name: str, dtype, chunk_size: int):
+        self.sink = sink
+        self.name = name
+        self.buffer = numpy.zeros(chunk_size, dtype=dtype)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.sink.flushed_rows + self.count
+
+    def append(self, value):
+        if self.count == len(self.buffer):
+            raise ValueError('Column \'{}\' is a full chunk ahead of the other columns of the sink.'.format(self.name))
+
+        self.buffer[self.count] = value
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.sink.flush_if_full()
+
+    def __getitem__(self, index: int):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('Index {} is out of range for column \'{}\' of length {}.'.format(index, self.name,
+                                                                                              length))
+
+        if index >= self.sink.flushed_rows:
+            return self.buffer[index - self.sink.flushed_rows].item()
+        return self.sink.read_value(self.name, index)
+
+    def __array__(self, dtype=None):
+        values = numpy.concatenate([self.sink.read_column(self.name), self.buffer[:self.count]])
+        return values.astype(dtype) if dtype is not None else values
+
+
+class RecordSink:
+    """Streams per-step records to disk in fixed-size chunks instead of keeping them in memory.
+
+    Values of every column are buffered in typed arrays of ``chunk_size`` values. Once every column holds a full chunk,
+    the chunk is written to the run's directory (``root/run_id``) as a new ``chunk-XXXXX.npz`` file (one array per
+    column) and the buffers are reused. Chunks are never rewritten, so a crashed run loses at most the rows that were
+    still buffered. The run id, seed and parameters of the run are stored in the run's ``meta.json``, see load_run()
+    and iter_runs() for reading runs back.
+
+    ``columns`` maps column names to numpy dtypes. ``sink.columns`` maps the same names to Column objects, which can
+    replace the record lists of a collector."""
+
+    def __init__(self, root: str, columns: dict, chunk_size: int = 4096, run_id: str = None, seed: int = None,
+                 params: dict = None):
+        run_id = run_id if run_id is not None else uuid.uuid4().hex
+        self.directory = os.path.join(root, run_id)
+        self.chunk_size = chunk_size
+        self.columns = {name: Column(self, name, dtype, chunk_size) for name, dtype in columns.items()}
+        self.chunks = []
+        self.flushed_rows = 0
+        self.cache = (None, None)
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.meta = {
+            'run_id': run_id,
+            'seed': seed,
+            'params': params if params is not None else {},
+            'columns': {name: numpy.dtype(dtype).str for name, dtype in columns.items()},
+            'chunk_size': chunk_size
+        }
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as file:
+            json.dump(self.meta, file, indent=2, default=str)
+
+    def __len__(self) -> int:
+        return min(len(column) for column in self.columns.values())
+
+    def __getitem__(self, name: str) -> Column:
+        return self.columns[name]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def append(self, record: dict):
+        """Appends a value to every column."""
+        for name, value in record.items():
+            self.columns[name].append(value)
+
+    def flush_if_full(self):
+        if all(column.count == self.chunk_size for column in self.columns.values()):
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows to a new chunk. Every column must hold the same number of buffered values."""
+        counts = {column.count for column in self.columns.values()}
+        if len(counts) > 1:
+            raise ValueError('Cannot flush a RecordSink whose columns have different lengths.')
+
+        count = counts.pop() if len(counts) > 0 else 0
+        if count == 0:
+            return
+
+        path = os.path.join(self.directory, 'chunk-{:05d}.npz'.format(len(self.chunks)))
+        # Write to a temporary file first so that readers never see a partially written chunk
+        with open(path + '.tmp', 'wb') as file:
+            numpy.savez(file, **{name: column.buffer[:count] for name, column in self.columns.items()})
+        os.replace(path + '.tmp', path)
+
+        self.chunks.append((path, self.flushed_rows, count))
+        self.flushed_rows += count
+        for column in self.columns.values():
+            column.count = 0
+
+    def close(self):
+        """Flushes the rows that are still buffered."""
+        self.flush()
+
+    def read_column(self, name: str) -> numpy.ndarray:
+        """Returns the flushed values of column ``name``."""
+        values = []
+        for path, _, _ in self.chunks:
+            with numpy.load(path) as arrays:
+                values.append(arrays[name])
+        return numpy.concatenate(values) if len(values) > 0 else self.columns[name].buffer[:0].copy()
+
+    def read_value(self, name: str, index: int):
+        """Returns the flushed value of column ``name`` at row ``index``. The values of the last chunk and column read
+        are cached in memory, so the chunk file is not kept open."""
+        for path, start, count in self.chunks:
+            if start <= index < start + count:
+                if self.cache[0] != (path, name):
+                    with numpy.load(path) as arrays:
+                        self.cache = ((path, name), arrays[name])
+                return self.cache[1][index - start].item()
+
+        raise IndexError('Row {} has not been flushed.'.format(index))
+
+
+def load_run(directory: str, columns: [str] = None) -> (dict, pandas.DataFrame):
+    """Returns the metadata and the records (only ``columns`` if supplied) of the run written to ``directory``."""
+    with open(os.path.join(directory, 'meta.json')) as file:
+        meta = json.load(file)
+
+    names = columns if columns is not None else list(meta['columns'].keys())
+    chunks = sorted(f for f in os.listdir(directory) if f.startswith('chunk-') and f.endswith('.npz'))
+    data = {name: [] for name in names}
+    for chunk in chunks:
+        with numpy.load(os.path.join(directory, chunk)) as arrays:
+            for name in names:
+                data[name].append(arrays[name])
+
+    return meta, pandas.DataFrame({name: numpy.concatenate(values) if len(values) > 0 else
+                                   numpy.zeros(0, dtype=meta['columns'][name]) for name, values in data.items()})
+
+
+def iter_runs(root: str, columns: [str] = None):
+    """Lazily yields (metadata, records) for every run written to ``root``, one run at a time."""
+    for name in sorted(os.listdir(root)):
+        directory = os.path.join(root, name)
+        if os.path.isfile(os.path.join(directory, 'meta.json')):
+            yield load_run(directory, columns)
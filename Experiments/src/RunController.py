@@ -0,0 +1,148 @@
+import time
+from collections import deque
+
+import ECAgent.Core as Core
+
+
+class StopCondition:
+    """Base class for the stop predicates used by the RunController. Override check() to return True once the run
+    should stop. Predicates are evaluated after every step so they should only read values the model already has."""
+
+    reason = 'stopped'
+
+    def reset(self, model: Core.Model):
+        """Called by the RunController before the first step of a run."""
+        pass
+
+    def check(self, model: Core.Model) -> bool:
+        return False
+
+
+class Extinction(StopCondition):
+    """Stops the run once the population returned by ``count(model)`` reaches zero."""
+
+    def __init__(self, count, name: str = 'population'):
+        self.count = count
+        self.reason = '{} extinct'.format(name)
+
+    def check(self, model: Core.Model) -> bool:
+        return self.count(model) <= 0
+
+
+class Explosion(StopCondition):
+    """Stops the run once the population returned by ``count(model)`` grows beyond ``limit``."""
+
+    def __init__(self, count, limit: int, name: str = 'population'):
+        self.count = count
+        self.limit = limit
+        self.reason = '{} explosion'.format(name)
+
+    def check(self, model: Core.Model) -> bool:
+        return self.count(model) > self.limit
+
+
+class Convergence(StopCondition):
+    """Stops the run once the residual returned by ``residual(model)`` (e.g. the number of agents that moved during the
+    last step) falls to or below ``tolerance``."""
+
+    reason = 'converged'
+
+    def __init__(self, residual, tolerance: float = 0.0):
+        self.residual = residual
+        self.tolerance = tolerance
+
+    def check(self, model: Core.Model) -> bool:
+        return self.residual(model) <= self.tolerance
+
+
+class SteadyState(StopCondition):
+    """Stops the run once the value returned by ``metric(model)`` has stayed within ``tolerance`` of itself for
+    ``window`` consecutive steps. The minimum and maximum of the window are tracked with monotonic queues so each check
+    costs O(1) amortized regardless of the window size."""
+
+    reason = 'steady state'
+
+    def __init__(self, metric, window: int, tolerance: float = 0.0):
+        self.metric = metric
+        self.window = window
+        self.tolerance = tolerance
+        self.step = 0
+        self.minima = deque()
+        self.maxima = deque()
+
+    def reset(self, model: Core.Model):
+        self.step = 0
+        self.minima.clear()
+        self.maxima.clear()
+
+    def check(self, model: Core.Model) -> bool:
+        value = self.metric(model)
+
+        while len(self.minima) > 0 and self.minima[-1][1] >= value:
+            self.minima.pop()
+        self.minima.append((self.step, value))
+
+        while len(self.maxima) > 0 and self.maxima[-1][1] <= value:
+            self.maxima.pop()
+        self.maxima.append((self.step, value))
+
+        # Drop values that have left the window
+        oldest = self.step - self.window + 1
+        if self.minima[0][0] < oldest:
+            self.minima.popleft()
+        if self.maxima[0][0] < oldest:
+            self.maxima.popleft()
+
+        self.step += 1
+        return self.step >= self.window and self.maxima[0][1] - self.minima[0][1] <= self.tolerance
+
+
+class WallClockBudget(StopCondition):
+    """Stops the run once it has been executing for longer than ``seconds``."""
+
+    reason = 'out of time'
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.deadline = None
+
+    def reset(self, model: Core.Model):
+        self.deadline = time.perf_counter() + self.seconds
+
+    def check(self, model: Core.Model) -> bool:
+        return time.perf_counter() > self.deadline
+
+
+class RunController:
+    """Executes a model for at most ``iterations`` steps, stopping early as soon as any of the supplied stop conditions
+    is met. After run() returns, ``steps`` holds the number of executed steps and ``reason`` describes why the run
+    ended ('completed' if it ran to the end)."""
+
+    def __init__(self, model: Core.Model, iterations: int, conditions: [StopCondition] = None, callback=None):
+        self.model = model
+        self.iterations = iterations
+        self.conditions = conditions if conditions is not None else []
+        self.callback = callback
+        self.steps = 0
+        self.reason = None
+
+    def run(self) -> int:
+        for condition in self.conditions:
+            condition.reset(self.model)
+
+        self.steps = 0
+        self.reason = 'completed'
+
+        while self.steps < self.iterations:
+            self.model.systemManager.executeSystems()
+            self.steps += 1
+
+            if self.callback is not None:
+                self.callback(self.model)
+
+            for condition in self.conditions:
+                if condition.check(self.model):
+                    self.reason = condition.reason
+                    return self.steps
+
+        return self.steps
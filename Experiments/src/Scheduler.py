@@ -0,0 +1,199 @@
+import hashlib
+import itertools
+import json
+import multiprocessing
+import multiprocessing.pool
+import os
+import time
+import traceback
+
+import numpy
+import pandas
+
+import cli
+from RunController import RunController
+
+# Model of each spec: (builder, stop conditions, summary of a finished run). Summaries are stored next to the
+# parameters of a job, so their keys are prefixed with 'final_' to never clash with a parameter (e.g. 'sheep')
+MODELS = {
+    'ants': (cli.build_ants, cli.ant_conditions,
+             lambda model: {'final_collected': model.systemManager.systems['collector'].records[-1]}),
+    'predator-prey': (cli.build_predator_prey, cli.predator_prey_conditions,
+                      lambda model: {'final_sheep': model.systemManager.systems['collector'].records['sheep'][-1],
+                                     'final_wolves': model.systemManager.systems['collector'].records['wolves'][-1]}),
+    'segregation': (cli.build_segregation, cli.segregation_conditions,
+                    lambda model: {'final_moved': model.systemManager.systems['move'].moved})
+}
+
+
+def job_id(job: dict) -> str:
+    """Returns an id that only depends on the model, parameters, seed and length of a job, so a job keeps its id
+    when the spec it came from is edited or reordered."""
+    key = json.dumps({name: job[name] for name in ['model', 'params', 'seed', 'iterations']}, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def expand(spec: dict) -> [dict]:
+    """Expands an experiment spec into jobs. A spec holds:
+        - 'model': the cli.py subcommand of the model ('ants', 'predator-prey' or 'segregation').
+        - 'iterations': the maximum length of every run.
+        - 'seeds': a list of seeds, or 'replicates' along with a 'seed' the seeds are drawn from.
+        - 'fixed': arguments shared by every job (optional).
+        - 'points': a list of argument sets (optional), e.g. scenarios that are not a grid.
+        - 'grid': a list of values for each swept argument (optional).
+    Arguments are named like the attributes of the model's cli.py arguments (e.g. 'grow', 'tile_size') and default to
+    their cli.py defaults. Every point is combined with every grid combination and every seed."""
+    if spec['model'] not in MODELS:
+        raise ValueError('Unknown model \'{}\', expected one of {}.'.format(spec['model'], list(MODELS)))
+
+    if 'seeds' in spec:
+        seeds = list(spec['seeds'])
+    else:
+        seeds = [int(seed) for seed in
+                 numpy.random.default_rng(spec.get('seed', 0)).integers(2 ** 31, size=spec['replicates'])]
+
+    defaults = vars(cli.build_parser().parse_args([spec['model']]))
+    grid = spec.get('grid', {})
+    combinations = [dict(zip(grid.keys(), values)) for values in itertools.product(*grid.values())]
+
+    jobs = []
+    for point in spec.get('points', [{}]):
+        for combination in combinations:
+            params = dict(spec.get('fixed', {}))
+            params.update(point)
+            params.update(combination)
+            unknown = [name for name in params if name not in defaults or name in ['seed', 'iterations', 'run']]
+            if len(unknown) > 0:
+                raise ValueError('Unknown arguments {} for model \'{}\'.'.format(unknown, spec['model']))
+
+            for seed in seeds:
+                job = {'model': spec['model'], 'params': params, 'seed': seed, 'iterations': spec['iterations']}
+                job['id'] = job_id(job)
+                jobs.append(job)
+
+    return jobs
+
+
+def run_job(job: dict, callback=None) -> dict:
+    """Runs a job and returns its result. Errors are returned rather than raised so that a failing job does not stop
+    the other jobs of the pool. ``callback(model)`` is called after every step."""
+    start = time.perf_counter()
+    try:
+        build, conditions, summarise = MODELS[job['model']]
+
+        parser = cli.build_parser().parse_args([job['model']])
+        vars(parser).update(job['params'])
+        parser.seed = job['seed']
+        parser.iterations = job['iterations']
+
+        model = build(parser)
+        controller = RunController(model, job['iterations'], conditions(model, parser), callback=callback)
+        try:
+            controller.run()
+        finally:
+            cli.close_systems(model)
+
+        result = {'id': job['id'], 'seed': job['seed'], 'steps': controller.steps, 'reason': controller.reason}
+        result.update(summarise(model))
+    except Exception:
+        return {'id': job['id'], 'error': traceback.format_exc()}
+
+    result['seconds'] = time.perf_counter() - start
+
+    clashes = [name for name in result if name in job['params']]
+    if len(clashes) > 0:
+        return {'id': job['id'], 'error': 'Results {} would overwrite the parameters of the job.'.format(clashes)}
+    return dict(job['params'], **result)
+
+
+class Ledger:
+    """An append-only, on-disk record of completed jobs with one JSON result per line. Every result is flushed and
+    synced before the next job is recorded, so an interrupted sweep loses at most the jobs that were still running. A
+    line cut short by a crash is ignored when the ledger is opened again."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.results = {}
+
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    try:
+                        result = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.results[result['id']] = result
+
+        self.file = open(path, 'a')
+        # Complete a line cut short by a crash so the next result starts on its own line
+        if self.file.tell() > 0:
+            with open(path, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b'\n':
+                    self.file.write('\n')
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.results
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def record(self, result: dict):
+        self.file.write(json.dumps(result, default=str) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.results[result['id']] = result
+
+    def close(self):
+        self.file.close()
+
+
+class Scheduler:
+    """Runs the jobs of an experiment spec (see expand()) on a pool of ``workers`` processes (or threads) and records
+    their results in the ledger ``directory/ledger.jsonl``. Jobs are handed out one at a time from a shared queue, so
+    a worker that finishes a short run (e.g. an early extinction) immediately takes the next job instead of waiting for
+    a static share of the work. Jobs already in the ledger are skipped, so running an interrupted sweep again resumes
+    it without recomputing anything. Jobs that fail are reported and left out of the ledger so they are retried on the
+    next run."""
+
+    def __init__(self, spec: dict, directory: str, workers: int = None, threads: bool = False):
+        self.jobs = expand(spec)
+        self.directory = directory
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.threads = threads
+        self.failures = []
+
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'spec.json'), 'w') as file:
+            json.dump(spec, file, indent=2)
+
+    def run(self) -> pandas.DataFrame:
+        """Runs the jobs that are not in the ledger yet and returns the results of every job of the spec that has
+        completed, in the order of the spec."""
+        ledger = Ledger(os.path.join(self.directory, 'ledger.jsonl'))
+        pending = [job for job in self.jobs if job['id'] not in ledger]
+        print('{} jobs, {} already completed, running {} on {} workers...'.format(len(self.jobs),
+                                                                                 len(self.jobs) - len(pending),
+                                                                                 len(pending), self.workers))
+
+        pool_type = multiprocessing.pool.ThreadPool if self.threads else multiprocessing.Pool
+        try:
+            with pool_type(self.workers) as pool:
+                for done, result in enumerate(pool.imap_unordered(run_job, pending, chunksize=1), 1):
+                    if 'error' in result:
+                        self.failures.append(result)
+                        print('Job {} failed:\n{}'.format(result['id'], result['error']))
+                    else:
+                        ledger.record(result)
+                    print('Completed {}/{} jobs'.format(done, len(pending)))
+        finally:
+            ledger.close()
+
+        return self.results(ledger)
+
+    def results(self, ledger: Ledger) -> pandas.DataFrame:
+        """Writes the results of every job of the spec in ``ledger`` to results.csv and returns them, in the order of
+        the spec."""
+        table = pandas.DataFrame([ledger.results[job['id']] for job in self.jobs if job['id'] in ledger])
+        table.to_csv(os.path.join(self.directory, 'results.csv'), index=False)
+        return table
@@ -0,0 +1,211 @@
+import os
+import sys
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ECAgent.Core as Core
+
+
+def resident_memory() -> int:
+    """Returns the resident set size of this process in bytes (its peak if the current size is not available)."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Publisher:
+    """Base class of the telemetry outputs. publish() receives every sample taken by a Telemetry object."""
+
+    def publish(self, sample: dict, labels: dict):
+        pass
+
+    def close(self):
+        pass
+
+
+def to_prometheus(sample: dict, labels: dict) -> str:
+    """Formats a sample in the Prometheus text exposition format."""
+    def series(name, value, extra=None):
+        names = dict(labels, **extra) if extra is not None else labels
+        tags = ','.join('{}="{}"'.format(key, str(value).replace('"', '\'')) for key, value in names.items())
+        return 'ecagent_{}{} {}'.format(name, '{' + tags + '}' if tags else '', value)
+
+    lines = []
+    for name in ['timestep', 'steps_per_second', 'agents', 'memory_bytes', 'eta_seconds']:
+        if sample[name] is not None:
+            lines.append('# TYPE ecagent_{} gauge'.format(name))
+            lines.append(series(name, sample[name]))
+
+    lines.append('# TYPE ecagent_system_seconds_per_step gauge')
+    for system, seconds in sample['systems'].items():
+        lines.append(series('system_seconds_per_step', seconds, {'system': system}))
+
+    lines.append('# TYPE ecagent_value gauge')
+    for name, value in sample['gauges'].items():
+        lines.append(series('value', value, {'name': name}))
+
+    return '\n'.join(lines) + '\n'
+
+
+class ConsolePublisher(Publisher):
+    """Rewrites a single status line on ``stream`` (stderr by default)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stderr
+
+    def publish(self, sample: dict, labels: dict):
+        systems = ' '.join('{}={:.1f}ms'.format(system, seconds * 1000) for system, seconds in sample['systems'].items())
+        gauges = ' '.join('{}={}'.format(name, value) for name, value in sample['gauges'].items())
+        eta = '{:.0f}s'.format(sample['eta_seconds']) if sample['eta_seconds'] is not None else '?'
+
+        self.stream.write('\rstep {} | {:.1f} steps/s | eta {} | agents {} | {:.0f}MB | {} {}'.format(
+            sample['timestep'], sample['steps_per_second'], eta, sample['agents'], sample['memory_bytes'] / 2 ** 20,
+            systems, gauges).rstrip() + '\033[K')
+        self.stream.flush()
+
+    def close(self):
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+class PrometheusFilePublisher(Publisher):
+    """Writes every sample to ``path`` in the Prometheus text format (e.g. for node_exporter's textfile collector). The
+    file is replaced atomically so readers never see a partial sample."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def publish(self, sample: dict, labels: dict):
+        with open(self.path + '.tmp', 'w') as file:
+            file.write(to_prometheus(sample, labels))
+        os.replace(self.path + '.tmp', self.path)
+
+
+class HTTPPublisher(Publisher):
+    """Serves the latest sample in the Prometheus text format at http://host:port/metrics from a background thread.
+    Port 0 picks a free port, see ``port``."""
+
+    def __init__(self, port: int = 0, host: str = '127.0.0.1'):
+        self.text = ''
+        publisher = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = publisher.text.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def publish(self, sample: dict, labels: dict):
+        self.text = to_prometheus(sample, labels)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Telemetry:
+    """Samples the progress of a model run and hands the samples to ``publishers``.
+
+    attach() wraps the execute() method of every system of the model to time it. step() must then be called after
+    every step (e.g. as the RunController's callback). It only compares the clock to the time of the last sample, so
+    samples are taken, and published, at most once every ``interval`` seconds. A sample holds:
+        - the timestep and the number of steps per second since the last sample.
+        - the mean time spent per step in each system since the last sample.
+        - the number of agents in the environment and the resident memory of the process.
+        - the estimated time left to reach ``iterations`` steps (None if unknown).
+        - the value of every ``gauges[name](model)``.
+    ``labels`` are attached to every exported series (e.g. the model name and seed)."""
+
+    def __init__(self, publishers: [Publisher], iterations: int = None, interval: float = 1.0, gauges: dict = None,
+                 labels: dict = None):
+        self.publishers = publishers
+        self.iterations = iterations
+        self.interval = interval
+        self.gauges = gauges if gauges is not None else {}
+        self.labels = labels if labels is not None else {}
+        self.model = None
+        self.system_time = {}
+        self.last_time = None
+        self.last_timestep = 0
+        self.steps = 0
+
+    def attach(self, model: Core.Model):
+        """Starts timing the systems of ``model``. Systems added afterwards are not timed."""
+        self.model = model
+        for system in model.systemManager.executionQueue:
+            self.system_time[system.id] = 0.0
+            system.execute = self.timed(system.id, system.execute)
+
+        self.last_time = time.perf_counter()
+        self.last_timestep = model.systemManager.timestep
+
+    def timed(self, id: str, execute):
+        def wrapper():
+            start = time.perf_counter()
+            execute()
+            self.system_time[id] += time.perf_counter() - start
+        return wrapper
+
+    def step(self, model: Core.Model):
+        self.steps += 1
+        if time.perf_counter() - self.last_time >= self.interval:
+            self.publish()
+
+    def sample(self) -> dict:
+        """Returns a sample of the statistics since the last sample and starts a new sampling window."""
+        now = time.perf_counter()
+        timestep = self.model.systemManager.timestep
+        steps = timestep - self.last_timestep
+        elapsed = now - self.last_time
+        rate = steps / elapsed if elapsed > 0 else 0.0
+
+        sample = {
+            'timestep': timestep,
+            'steps_per_second': rate,
+            'systems': {id: seconds / steps if steps > 0 else 0.0 for id, seconds in self.system_time.items()},
+            'agents': len(self.model.environment.agents),
+            'memory_bytes': resident_memory(),
+            'eta_seconds': (self.iterations - self.steps) / rate if self.iterations is not None and rate > 0 else None,
+            'gauges': {name: gauge(self.model) for name, gauge in self.gauges.items()}
+        }
+
+        self.last_time = now
+        self.last_timestep = timestep
+        for id in self.system_time:
+            self.system_time[id] = 0.0
+
+        return sample
+
+    def publish(self):
+        """Takes a sample and publishes it."""
+        sample = self.sample()
+        for publisher in self.publishers:
+            publisher.publish(sample, self.labels)
+
+    def close(self):
+        """Publishes a final sample and closes the publishers."""
+        self.publish()
+        for publisher in self.publishers:
+            publisher.close()
@@ -0,0 +1,105 @@
+import argparse
+import gc
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+for project in ['ForagingAntSimulator', 'SimplePredatorPrey', 'SegregationModel',
+                os.path.join('Introduction', 'Solution')]:
+    sys.path.append(os.path.join(ROOT, project, 'src'))
+
+from AntSim import ForagingAntSimulator
+from PredatorPrey import PredatorPreyModel
+from SegregationModel import SegregationModel
+from Tutorial import MoneyModel
+
+RESOURCES = os.path.join(ROOT, 'ForagingAntSimulator', 'resources')
+
+
+def build_ants(agents: int, seed: int, backend: str):
+    return ForagingAntSimulator(os.path.join(RESOURCES, 'NEST_BLANK.png'), os.path.join(RESOURCES, 'NEST_BLANK.png'),
+                                os.path.join(RESOURCES, 'NEST_FOOD.png'), 50, agents, 0.25, 0.9, 50, 100, False, 1.0,
+                                False, seed, backend)
+
+
+def build_predator_prey(agents: int, seed: int, backend: str):
+    return PredatorPreyModel(50, agents - agents // 3, agents // 3, 30, 4, 25, 0.04, 0.06, seed, False, backend)
+
+
+def build_segregation(agents: int, seed: int, backend: str):
+    # Leave roughly 10% of the cells vacant
+    size = max(2, math.ceil(math.sqrt(agents / 0.9)))
+    return SegregationModel(size, agents // 2, agents - agents // 2, 0.5, seed, False, backend)
+
+
+def build_money(agents: int, seed: int, backend: str):
+    # The array-backed mode of the tutorial's MoneyModel is a baseline for the cost of the framework itself
+    return MoneyModel(agents, vectorized=True, seed=seed)
+
+
+def build_money_metrics(agents: int, seed: int, backend: str):
+    # The same baseline with the WealthCollector (Gini and percentiles) recording every step
+    return MoneyModel(agents, vectorized=True, seed=seed, metrics=True)
+
+
+BUILDERS = {
+    'ants': build_ants,
+    'predator-prey': build_predator_prey,
+    'segregation': build_segregation,
+    'money': build_money,
+    'money-metrics': build_money_metrics
+}
+
+
+def memory_per_agent(builder, agents: int, seed: int, backend: str) -> float:
+    """Returns the number of bytes allocated per agent, measured as the difference in traced memory between a model
+    with ``2 * agents`` agents and one with ``agents`` agents. A throwaway model is built first so that one-time
+    allocations (imports, caches and the internals of ECAgent and numpy) are not charged to either model."""
+    builder(agents, seed, backend)
+
+    usage = []
+    for count in [agents, 2 * agents]:
+        gc.collect()
+        tracemalloc.start()
+        model = builder(count, seed, backend)
+        usage.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+        del model
+
+    return (usage[1] - usage[0]) / agents
+
+
+def time_per_step(builder, agents: int, seed: int, backend: str, steps: int) -> float:
+    """Returns the mean wall-clock time of a step in seconds."""
+    model = builder(agents, seed, backend)
+    start = time.perf_counter()
+    for _ in range(steps):
+        model.systemManager.executeSystems()
+    return (time.perf_counter() - start) / steps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', help='Models to benchmark.', nargs='+', default=list(BUILDERS.keys()),
+                        choices=list(BUILDERS.keys()))
+    parser.add_argument('--agents', help='Number of agents.', default=1000, type=int)
+    parser.add_argument('--steps', help='Number of timed steps.', default=10, type=int)
+    parser.add_argument('--seed', help='Seed of random number generator.', default=345968, type=int)
+    parser.add_argument('--backend', help='Kernel backend.', default='python', choices=['python', 'numba'])
+
+    parser = parser.parse_args()
+
+    print('{:<16}{:>10}{:>18}{:>16}'.format('model', 'agents', 'bytes per agent', 'ms per step'))
+    for name in parser.models:
+        builder = BUILDERS[name]
+        memory = memory_per_agent(builder, parser.agents, parser.seed, parser.backend)
+        step = time_per_step(builder, parser.agents, parser.seed, parser.backend, parser.steps)
+        print('{:<16}{:>10}{:>18.1f}{:>16.2f}'.format(name, parser.agents, memory, step * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,564 @@
+import time
+
+# Measured before anything else is imported so that --timing includes the cost of importing the models
+START = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+for project in ['ForagingAntSimulator', 'SimplePredatorPrey', 'SegregationModel']:
+    sys.path.append(os.path.join(ROOT, project, 'src'))
+
+from RecordSink import RecordSink
+from RunController import RunController, Convergence, Extinction, SteadyState, WallClockBudget
+from Telemetry import Telemetry, ConsolePublisher, PrometheusFilePublisher, HTTPPublisher
+
+
+def add_run_arguments(parser, iterations: int):
+    """Adds the arguments shared by every model."""
+    parser.add_argument('--iterations', help='Length of Simulation.', default=iterations, type=int)
+    parser.add_argument('--seed', help='Seed of random number generator.', default=345968, type=int)
+    parser.add_argument('--images', help='Write environment to images?', action='store_true')
+    parser.add_argument('--backend', help='Kernel backend.', default='python', choices=['python', 'numba'])
+    parser.add_argument('--budget', help='Wall-clock budget of the simulation in seconds.', default=None, type=float)
+    parser.add_argument('--async-collection', help='Run collectors on a background thread?', action='store_true')
+    parser.add_argument('--timing', help='Report the time from start-up to the end of the first step?',
+                        action='store_true')
+    parser.add_argument('--progress', help='Show a telemetry line instead of printing every iteration?',
+                        action='store_true')
+    parser.add_argument('--telemetry-file', help='Path of the Prometheus text file telemetry is written to.',
+                        default=None, type=str)
+    parser.add_argument('--telemetry-port', help='Port of the local HTTP endpoint telemetry is served on.',
+                        default=None, type=int)
+    parser.add_argument('--telemetry-interval', help='Seconds between telemetry samples.', default=1.0, type=float)
+
+
+def add_ant_arguments(parser):
+    """Adds the arguments of the foraging ant simulator."""
+    parser.add_argument('-f1', '--file1', help='Path to first File.', default=None, type=str)
+    parser.add_argument('-f2', '--file2', help='Path to second File.', default=None, type=str)
+    parser.add_argument('-f3', '--file3', help='Path to third File.', default=None, type=str)
+    parser.add_argument('--frequency', help='Frequency of f1 and f2 border switch.', default=50, type=int)
+    parser.add_argument('--reset', help='Frequency of resource resetting.', default=100, type=int)
+    parser.add_argument('-s', '--size', help='Size of the environment.', default=50, type=int)
+    parser.add_argument('--ants', help='Number of ants.', default=50, type=int)
+    parser.add_argument('--deposit', help='Pheromone Deposit Rate', default=0.25, type=float)
+    parser.add_argument('--diffuse', help='Diffuse Pheromones to adjacent cells?', action='store_true')
+    parser.add_argument('--lazy-decay', help='Only decay pheromones around the ants? (not with --diffuse)',
+                        action='store_true')
+    parser.add_argument('--mult', help='Number of resources to deposit on a resource cell', default=1.0, type=float)
+
+
+def make_telemetry(parser, labels: dict, gauges: dict = None) -> Telemetry:
+    """Returns the Telemetry requested by the --progress, --telemetry-file and --telemetry-port arguments (None if
+    none were supplied)."""
+    publishers = []
+    if parser.progress:
+        publishers.append(ConsolePublisher())
+    if parser.telemetry_file is not None:
+        publishers.append(PrometheusFilePublisher(parser.telemetry_file))
+    if parser.telemetry_port is not None:
+        publishers.append(HTTPPublisher(parser.telemetry_port))
+        print('Serving telemetry on http://127.0.0.1:{}/metrics'.format(publishers[-1].port))
+
+    if len(publishers) == 0:
+        return None
+    return Telemetry(publishers, parser.iterations, parser.telemetry_interval, gauges, labels)
+
+
+def close_systems(model):
+    """Closes the systems of ``model`` that hold resources beyond the run, e.g. the background threads of asynchronous
+    collectors (see AsyncCollector) or the worker pool of the tiled segregation engine."""
+    for system in model.systemManager.systems.values():
+        if hasattr(system, 'close'):
+            system.close()
+
+
+def run(model, parser, conditions, callback=None, sink=None, gauges: dict = None) -> RunController:
+    """Runs ``model`` with a RunController, adding the --budget condition, reporting the time to the first step if
+    --timing was supplied, publishing telemetry (with ``gauges``) if requested and closing the systems of the model
+    (see close_systems()) and ``sink`` once the run is over. ``callback`` is not called when --progress was supplied."""
+    if parser.budget is not None:
+        conditions.append(WallClockBudget(parser.budget))
+
+    telemetry = make_telemetry(parser, {'model': parser.model, 'seed': parser.seed}, gauges)
+    if telemetry is not None:
+        telemetry.attach(model)
+    if parser.progress:
+        callback = None
+
+    def step(m):
+        if m.systemManager.timestep == 1 and parser.timing:
+            print('Time to first step: {:.3f}s'.format(time.perf_counter() - START))
+        if callback is not None:
+            callback(m)
+        if telemetry is not None:
+            telemetry.step(m)
+
+    controller = RunController(model, parser.iterations, conditions, callback=step)
+    try:
+        controller.run()
+    finally:
+        close_systems(model)
+        if telemetry is not None:
+            telemetry.close()
+        if sink is not None:
+            sink.close()
+
+    return controller
+
+
+def parse_nest(value: str) -> (int, int):
+    """Parses the x,y centre of a nest of the --nests argument."""
+    try:
+        x, y = (int(coordinate) for coordinate in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError('Expected a nest as x,y, not \'{}\'.'.format(value))
+    return x, y
+
+
+def build_ants(parser):
+    """Returns the ForagingAntSimulator described by the ant arguments."""
+    from AntSim import ForagingAntSimulator
+
+    return ForagingAntSimulator(
+        parser.file1,
+        parser.file2,
+        parser.file3,
+        parser.size,
+        parser.ants,
+        parser.deposit,
+        parser.decay,
+        parser.frequency,
+        parser.reset,
+        parser.diffuse,
+        parser.mult,
+        parser.images,
+        parser.seed,
+        parser.backend,
+        parser.async_collection,
+        parser.colonies,
+        parser.nests,
+        layer_cache=parser.layer_cache,
+        lazy_decay=parser.lazy_decay)
+
+
+def ant_conditions(model, parser) -> list:
+    """Returns the stop conditions of an ant run: none unless --patience was supplied."""
+    records = model.systemManager.systems['collector'].records
+
+    conditions = []
+    if parser.patience is not None:
+        conditions.append(SteadyState(lambda m: records[-1], parser.patience))
+    return conditions
+
+
+def run_ants(parser):
+    from AntSim import CollectedComponent
+
+    model = build_ants(parser)
+
+    # Stream the collected resources to disk instead of keeping them in memory
+    sink = None
+    if parser.records is not None:
+        sink = RecordSink(parser.records, {'collected': np.int64}, seed=parser.seed, params=vars(parser))
+        model.systemManager.systems['collector'].records = sink.columns['collected']
+
+    records = model.systemManager.systems['collector'].records
+
+    controller = run(model, parser, ant_conditions(model, parser), sink=sink, gauges={'collected': lambda m: records[-1]})
+    iterations = controller.steps
+    print('Stopped: {} after {} iterations'.format(controller.reason, iterations))
+    if len(model.nests) > 1:
+        print('Collected per colony: {}'.format(model.environment[CollectedComponent].colonies.tolist()))
+
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(dpi=200)
+    ax.set_title('Collected resources in \nForaging Ant Simulator')
+    ax.set_xlabel('Iterations')
+    ax.set_ylabel('Collected Resources')
+
+    iterations = np.arange(iterations)
+
+    ax.plot(iterations, np.asarray(records))
+    ax.set_aspect('auto')
+    fig.savefig('collected.png')
+
+
+def stream_ant_records(model, parser, seed: int, scenario: str):
+    """Streams the collection records of ``model`` to the --records directory. Returns the RecordSink (None if no
+    directory was supplied), which must be closed once the run is over."""
+    if parser.records is None:
+        return None
+
+    params = dict(vars(parser), scenario=scenario)
+    sink = RecordSink(parser.records, {'collected': np.int64}, run_id='{}-{}'.format(scenario.replace(' ', '-'), seed),
+                      seed=seed, params=params)
+    model.systemManager.systems['collector'].records = sink.columns['collected']
+    return sink
+
+
+def run_ants_batch(parser):
+    from AntSim import ForagingAntSimulator
+
+    seeds = [73142, 61272, 47223, 96646, 43169, 27701, 67950, 58312, 22496, 43277,
+             87574, 85422, 39446, 91878, 90483, 74729, 30464, 94072, 41488, 80227,
+             73890, 48275, 23865, 96789, 93226, 5819, 60490, 4067, 98684, 22235,
+             53161, 55927, 53825, 44493, 72365, 6057, 1518, 81830, 59560, 92746,
+             31778, 52347, 5120, 44947, 70959, 93148, 94759, 40965, 75834, 30914]
+
+    print("Seeds:")
+    print(seeds)
+
+    graphs = np.zeros((3, parser.iterations))
+
+    # Every scenario is run with each seed: (name, deposit rate, decay rate)
+    scenarios = [('with decay', parser.deposit, 0.9), ('no decay', parser.deposit, 1.0), ('random search', 0.0, 0.0)]
+
+    for i, (scenario, deposit, decay) in enumerate(scenarios):
+        for seed in seeds:
+            model = ForagingAntSimulator(
+                parser.file1,
+                parser.file2,
+                parser.file3,
+                parser.size,
+                parser.ants,
+                deposit,
+                decay,
+                parser.frequency,
+                parser.reset,
+                parser.diffuse,
+                parser.mult,
+                False,
+                seed,
+                parser.backend,
+                lazy_decay=parser.lazy_decay)
+
+            sink = stream_ant_records(model, parser, seed, scenario)
+
+            for _ in range(parser.iterations):
+                model.systemManager.executeSystems()
+
+            graphs[i] += np.asarray(model.systemManager.systems['collector'].records)
+            if sink is not None:
+                sink.close()
+
+    graphs /= len(seeds)
+
+    delta = np.copy(graphs)
+    delta[:, 1:] -= graphs[:, 0:-1]
+
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(dpi=200)
+    ax.set_title('Amount of Resources Collected by Different\n Ant Types in a Dynamic Environment')
+    ax.set_xlabel('Iterations')
+    ax.set_ylabel('Collected Resources')
+
+    iterations = np.arange(parser.iterations)
+
+    for i, (scenario, _, _) in enumerate(scenarios):
+        ax.plot(iterations, graphs[i], label=scenario)
+
+    ax.legend(loc='lower right')
+
+    ax.set_aspect('auto')
+    fig.savefig('collected.png')
+    plt.close(fig)
+
+    fig, ax = plt.subplots(dpi=200)
+    ax.set_title('Rate of Resource Collection Resources by Different \n Ant Types in the Dynamic Environment Scenario')
+    ax.set_xlabel('Iterations')
+    ax.set_ylabel('Collected Resources')
+
+    for i, (scenario, _, _) in enumerate(scenarios):
+        ax.plot(iterations, delta[i], label=scenario)
+
+    ax.legend(loc='upper right')
+
+    ax.set_aspect('auto')
+    fig.savefig('collected_rate.png')
+    plt.close(fig)
+
+
+def build_predator_prey(parser):
+    """Returns the PredatorPreyModel described by the predator-prey arguments."""
+    from PredatorPrey import PredatorPreyModel
+
+    return PredatorPreyModel(
+        parser.size,
+        parser.sheep,
+        parser.wolf,
+        parser.grow,
+        parser.sgain,
+        parser.wgain,
+        parser.srepro,
+        parser.wrepro,
+        parser.seed,
+        parser.images,
+        parser.backend,
+        parser.async_collection,
+        parser.regrowth)
+
+
+def predator_prey_conditions(model, parser) -> list:
+    """Returns the stop conditions of a predator-prey run: the dynamics are over once either species has died out."""
+    records = model.systemManager.systems['collector'].records
+
+    return [
+        Extinction(lambda m: records['sheep'][-1], 'sheep'),
+        Extinction(lambda m: records['wolves'][-1], 'wolves')
+    ]
+
+
+def run_predator_prey(parser):
+    model = build_predator_prey(parser)
+
+    # Stream the populations to disk instead of keeping them in memory
+    sink = None
+    if parser.records is not None:
+        sink = RecordSink(parser.records, {'sheep': np.int64, 'wolves': np.int64}, seed=parser.seed,
+                          params=vars(parser))
+        model.systemManager.systems['collector'].records = sink.columns
+
+    records = model.systemManager.systems['collector'].records
+    conditions = predator_prey_conditions(model, parser)
+
+    def report(m):
+        print('Iteration: {}: Sheep: {} Wolves:{}'.format(m.systemManager.timestep - 1, records['sheep'][-1],
+                                                          records['wolves'][-1]))
+
+    gauges = {'sheep': lambda m: records['sheep'][-1], 'wolves': lambda m: records['wolves'][-1]}
+    controller = run(model, parser, conditions, callback=report, sink=sink, gauges=gauges)
+    print('Stopped: {}'.format(controller.reason))
+
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.set_title('Sheep and Wolf Populations in \nSimple Predator Prey Model')
+    ax.set_xlabel('Iterations')
+    ax.set_ylabel('Population')
+
+    iterations = np.arange(controller.steps)
+
+    for prop in records:
+        ax.plot(iterations, np.asarray(records[prop]), label=prop)
+
+    ax.legend(loc='lower right')
+
+    ax.set_aspect('auto')
+    fig.savefig('population.png')
+
+
+def build_segregation(parser):
+    """Returns the SegregationModel (or TiledSegregationModel if --tile-size was supplied) described by the segregation
+    arguments, with a MetricsCollector if --metrics was supplied."""
+    from SegregationModel import SegregationModel, MetricsCollector
+
+    if parser.tile_size is not None:
+        from SegregationTiles import TiledSegregationModel
+
+        model = TiledSegregationModel(
+            parser.size,
+            parser.blue,
+            parser.red,
+            parser.preference,
+            parser.seed,
+            parser.images,
+            parser.tile_size,
+            parser.workers,
+            parser.async_collection
+        )
+    else:
+        model = SegregationModel(
+            parser.size,
+            parser.blue,
+            parser.red,
+            parser.preference,
+            parser.seed,
+            parser.images,
+            parser.backend,
+            parser.frontier,
+            parser.async_collection
+        )
+
+    if parser.metrics is not None:
+        metrics = MetricsCollector('metrics', model, parser.metrics_frequency, asynchronous=parser.async_collection)
+        # The collector closes the sink along with itself, see close_systems()
+        metrics.records = RecordSink(parser.metrics, metrics.columns(), seed=parser.seed, params=vars(parser))
+        model.systemManager.addSystem(metrics)
+
+    return model
+
+
+def segregation_conditions(model, parser) -> list:
+    """Returns the stop conditions of a segregation run: a step passes without any unhappy household moving (which also
+    leaves the frontier empty)."""
+    return [Convergence(lambda m: m.systemManager.systems['move'].moved)]
+
+
+def run_segregation(parser):
+    model = build_segregation(parser)
+
+    controller = run(model, parser, segregation_conditions(model, parser),
+                     callback=lambda m: print('Iteration: {}...'.format(m.systemManager.timestep - 1)),
+                     gauges={'moved': lambda m: m.systemManager.systems['move'].moved})
+
+    print('...Done! ({} after {} iterations)'.format(controller.reason, controller.steps))
+
+
+def run_schedule(parser):
+    import json
+
+    from Scheduler import Scheduler
+
+    with open(parser.spec) as file:
+        spec = json.load(file)
+
+    scheduler = Scheduler(spec, parser.output, parser.workers, parser.threads)
+    table = scheduler.run()
+    print('...Done! {} of {} jobs completed ({} failed), results written to {}'.format(
+        len(table), len(scheduler.jobs), len(scheduler.failures), os.path.join(parser.output, 'results.csv')))
+
+
+def run_coordinate(parser):
+    import json
+
+    from Distributed import Coordinator
+
+    with open(parser.spec) as file:
+        spec = json.load(file)
+
+    coordinator = Coordinator(spec, parser.output, parser.host, parser.port, parser.token)
+    table = coordinator.run()
+    print('...Done! {} of {} jobs completed ({} failed), results written to {}'.format(
+        len(table), len(coordinator.jobs), len(coordinator.failures), os.path.join(parser.output, 'results.csv')))
+
+
+def run_work(parser):
+    import multiprocessing
+
+    from Distributed import work
+
+    args = (parser.host, parser.port, parser.token, None, parser.batch, parser.retry)
+    if parser.workers == 1:
+        print('...Done! {} jobs run'.format(work(*args)))
+        return
+
+    # Local worker processes, e.g. one per core of the machine
+    processes = [multiprocessing.Process(target=work, args=args) for _ in range(parser.workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    print('...Done! {} workers stopped'.format(len(processes)))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Runs the tutorial models.')
+    subparsers = parser.add_subparsers(dest='model', required=True)
+
+    ants = subparsers.add_parser('ants', help='Foraging Ant Simulator.')
+    add_ant_arguments(ants)
+    add_run_arguments(ants, 1000)
+    ants.add_argument('--decay', help='Pheromone Decay Rate', default=0.6, type=float)
+    ants.add_argument('--colonies', help='Number of competing colonies.', default=1, type=int)
+    ants.add_argument('--nests', help='Nest centres as x,y pairs, one per colony (overrides --colonies).', nargs='+',
+                      default=None, type=parse_nest)
+    ants.add_argument('--layer-cache', help='Directory map layers are memory-mapped from (for very large maps).',
+                      default=None, type=str)
+    ants.add_argument('--patience', help='Stop after this many iterations without collecting resources.',
+                      default=None, type=int)
+    ants.add_argument('--records', help='Directory collection records are streamed to.', default=None, type=str)
+    ants.set_defaults(run=run_ants)
+
+    batch = subparsers.add_parser('ants-batch', help='Foraging Ant Simulator with and without pheromones over a batch '
+                                                     'of seeds.')
+    add_ant_arguments(batch)
+    batch.add_argument('--iterations', help='Length of Simulation.', default=1000, type=int)
+    batch.add_argument('--backend', help='Kernel backend.', default='python', choices=['python', 'numba'])
+    batch.add_argument('--records', help='Directory the records of every run are streamed to.', default=None,
+                       type=str)
+    batch.set_defaults(run=run_ants_batch)
+
+    predator_prey = subparsers.add_parser('predator-prey', help='Simple Predator Prey Model.')
+    predator_prey.add_argument('-s', '--size', help='Size of the environment.', default=50, type=int)
+    predator_prey.add_argument('--sheep', help='Number of initial Sheep.', default=100, type=int)
+    predator_prey.add_argument('--wolf', help='Number of initial Wolves.', default=50, type=int)
+    predator_prey.add_argument('--grow', help='Regrow Rate of Grass Entities.', default=30, type=int)
+    predator_prey.add_argument('--sgain', help='Sheep Gain.', default=4, type=int)
+    predator_prey.add_argument('--wgain', help='Wolf Gain.', default=25, type=int)
+    predator_prey.add_argument('--srepro', help='Reproduction Rate of Sheep.', default=0.04, type=float)
+    predator_prey.add_argument('--wrepro', help='Reproduction Rate of Wolves.', default=0.06, type=float)
+    predator_prey.add_argument('--regrowth', help='Grass regrowth: countdowns of every cell or a timing wheel.',
+                               default='countdown', choices=['countdown', 'wheel'])
+    add_run_arguments(predator_prey, 1000)
+    predator_prey.add_argument('--records', help='Directory population records are streamed to.', default=None,
+                               type=str)
+    predator_prey.set_defaults(run=run_predator_prey)
+
+    segregation = subparsers.add_parser('segregation', help='Schelling Segregation Model.')
+    segregation.add_argument('-s', '--size', help='Size of the environment.', default=50, type=int)
+    segregation.add_argument('--red', help='Number of red houses.', default=1000, type=int)
+    segregation.add_argument('--blue', help='Number of blue houses.', default=1000, type=int)
+    segregation.add_argument('--preference', help='How similar an agents neighbours need to be.', default=0.0,
+                             type=float)
+    add_run_arguments(segregation, 100)
+    segregation.add_argument('--frontier', help='Only re-evaluate households whose neighbourhood changed?',
+                             action='store_true')
+    segregation.add_argument('--tile-size', help='Run the tiled engine with tiles of this size.', default=None,
+                             type=int)
+    segregation.add_argument('--workers', help='Number of worker threads of the tiled engine.', default=None,
+                             type=int)
+    segregation.add_argument('--metrics', help='Directory the segregation metrics are streamed to (see RecordSink).',
+                             default=None, type=str)
+    segregation.add_argument('--metrics-frequency', help='Number of iterations between metric collections.',
+                             default=1, type=int)
+    segregation.set_defaults(run=run_segregation)
+
+    schedule = subparsers.add_parser('schedule', help='Runs (or resumes) the jobs of an experiment spec.')
+    schedule.add_argument('spec', help='Path of the JSON experiment spec.', type=str)
+    schedule.add_argument('-o', '--output', help='Directory of the job ledger and results.', default='experiment',
+                          type=str)
+    schedule.add_argument('--workers', help='Number of worker processes.', default=None, type=int)
+    schedule.add_argument('--threads', help='Run the workers as threads of this process instead of processes.',
+                          action='store_true')
+    schedule.set_defaults(run=run_schedule)
+
+    coordinate = subparsers.add_parser('coordinate', help='Serves the jobs of an experiment spec to workers over TCP.')
+    coordinate.add_argument('spec', help='Path of the JSON experiment spec.', type=str)
+    coordinate.add_argument('-o', '--output', help='Directory of the job ledger, results and records.',
+                            default='experiment', type=str)
+    coordinate.add_argument('--host', help='Address to listen on (0.0.0.0 to accept workers of other machines).',
+                            default='127.0.0.1', type=str)
+    coordinate.add_argument('--port', help='Port to listen on.', default=5717, type=int)
+    coordinate.add_argument('--token', help='Token workers must present.', default='', type=str)
+    coordinate.set_defaults(run=run_coordinate)
+
+    worker = subparsers.add_parser('work', help='Runs jobs served by a coordinator.')
+    worker.add_argument('--host', help='Address of the coordinator.', default='127.0.0.1', type=str)
+    worker.add_argument('--port', help='Port of the coordinator.', default=5717, type=int)
+    worker.add_argument('--token', help='Token of the coordinator.', default='', type=str)
+    worker.add_argument('--workers', help='Number of worker processes.', default=1, type=int)
+    worker.add_argument('--batch', help='Number of steps whose records are sent back at once.', default=100,
+                        type=int)
+    worker.add_argument('--retry', help='Seconds to keep trying to reach the coordinator.', default=30.0,
+                        type=float)
+    worker.set_defaults(run=run_work)
+
+    return parser
+
+
+def main(args: [str] = None):
+    parser = build_parser().parse_args(args)
+    parser.run(parser)
+
+
+if __name__ == '__main__':
+    main()
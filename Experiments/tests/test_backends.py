@@ -0,0 +1,50 @@
+"""Tests of the optional numba backend shared by the models (Backends.py). The tests/test_backends.py of every model
+checks that its numba kernels reproduce its python backend."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC)
+
+import Backends
+import benchmark
+
+import AntKernels
+import PredatorPreyKernels
+import SegregationKernels
+
+
+def test_jit_returns_python_function_without_numba(monkeypatch):
+    monkeypatch.setattr(Backends, 'NUMBA_AVAILABLE', False)
+
+    def add(a, b):
+        return a + b
+
+    assert Backends.jit(add) is add
+
+
+@pytest.mark.skipif(not Backends.NUMBA_AVAILABLE, reason='numba is not installed')
+def test_numba_is_imported_on_first_call(tmp_path):
+    script = tmp_path / 'script.py'
+    script.write_text('import sys\n'
+                      'sys.path.insert(0, {!r})\n'
+                      'import Backends\n'
+                      '\n'
+                      '@Backends.jit\n'
+                      'def add(a, b):\n'
+                      '    return a + b\n'
+                      '\n'
+                      'assert "numba" not in sys.modules\n'
+                      'assert add(1, 2) == 3\n'
+                      'assert "numba" in sys.modules\n'.format(SRC))
+    subprocess.run([sys.executable, str(script)], check=True)
+
+
+@pytest.mark.parametrize('model, kernels', [('ants', AntKernels), ('predator-prey', PredatorPreyKernels),
+                                            ('segregation', SegregationKernels)])
+def test_models_fall_back_to_python_without_numba(monkeypatch, model, kernels):
+    monkeypatch.setattr(kernels, 'NUMBA_AVAILABLE', False)
+    assert benchmark.BUILDERS[model](100, 1, 'numba').backend == 'python'
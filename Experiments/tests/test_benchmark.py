@@ -0,0 +1,18 @@
+"""Tests of the measurements of benchmark.py."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import benchmark
+
+
+@pytest.mark.parametrize('model', list(benchmark.BUILDERS.keys()))
+def test_memory_per_agent_is_positive_and_stable(model):
+    builder = benchmark.BUILDERS[model]
+    small, large = [benchmark.memory_per_agent(builder, agents, 345968, 'python') for agents in [200, 800]]
+
+    assert small > 0 and large > 0
+    assert abs(small - large) <= 0.2 * max(small, large)
@@ -0,0 +1,64 @@
+"""Tests of the Coordinator and workers of Distributed.py on localhost."""
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from Distributed import Coordinator, work
+
+SPEC = {'model': 'segregation', 'iterations': 3, 'seeds': list(range(8)), 'fixed': {'size': 20, 'blue': 150, 'red': 150}}
+
+
+class StoppedCoordinator(Coordinator):
+    """Stops handing out jobs as soon as the first job completes, like a coordinator interrupted by Ctrl+C."""
+
+    def complete(self, job: dict, result: dict, sink):
+        super().complete(job, result, sink)
+        self.stop()
+
+
+def serve(coordinator: Coordinator, workers: int = 2):
+    """Runs ``coordinator`` with ``workers`` worker threads and returns its results."""
+    threads = [threading.Thread(target=work, args=('127.0.0.1', coordinator.address[1], 'secret', 'w{}'.format(i)),
+                                daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    results = coordinator.run()
+    for thread in threads:
+        thread.join(timeout=60)
+        assert not thread.is_alive()
+
+    return results
+
+
+def ledger_ids(directory) -> [str]:
+    with open(os.path.join(directory, 'ledger.jsonl')) as file:
+        return [json.loads(line)['id'] for line in file if line.strip()]
+
+
+def test_every_job_completes_exactly_once(tmp_path):
+    coordinator = Coordinator(SPEC, str(tmp_path), token='secret')
+    results = serve(coordinator)
+
+    ids = [job['id'] for job in coordinator.jobs]
+    assert list(results['id']) == ids
+    assert sorted(ledger_ids(tmp_path)) == sorted(ids)
+    assert set(results['worker']) <= {'w0', 'w1'}
+    assert sorted(os.listdir(os.path.join(tmp_path, 'records'))) == sorted(ids)
+
+
+def test_stopped_run_resumes_from_ledger(tmp_path):
+    stopped = StoppedCoordinator(SPEC, str(tmp_path), token='secret')
+    partial = serve(stopped)
+    assert 1 <= len(partial) < len(stopped.jobs)
+    assert len(ledger_ids(tmp_path)) == len(partial)
+
+    coordinator = Coordinator(SPEC, str(tmp_path), token='secret')
+    results = serve(coordinator)
+
+    ids = [job['id'] for job in coordinator.jobs]
+    assert list(results['id']) == ids
+    assert sorted(ledger_ids(tmp_path)) == sorted(ids)
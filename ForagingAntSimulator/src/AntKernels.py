@@ -0,0 +1,205 @@
+import numpy
+
+# ForagingAntSimulator only uses these kernels when NUMBA_AVAILABLE, see Experiments/src/Backends.py
+from Backends import NUMBA_AVAILABLE, jit
+
+
+def _build_offsets():
+    """Returns the candidate cell offsets of every heading, the cells ahead of and beside the heading (every neighbour
+    when standing still), indexed by (x_dir + 1) * 3 + (y_dir + 1). The order of the candidates is part of the model,
+    since ties and random moves are drawn by index."""
+    headings = {
+        (0, 0): [(-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1)],
+        (-1, 0): [(-1, 0), (-1, 1), (-1, -1)],
+        (-1, 1): [(-1, 0), (-1, 1), (0, 1)],
+        (0, 1): [(-1, 1), (0, 1), (1, 1)],
+        (1, 1): [(0, 1), (1, 1), (1, 0)],
+        (1, 0): [(1, 1), (1, 0), (1, -1)],
+        (1, -1): [(1, 0), (1, -1), (0, -1)],
+        (0, -1): [(1, -1), (0, -1), (-1, -1)],
+        (-1, -1): [(-1, 0), (0, -1), (-1, -1)]
+    }
+
+    offsets = numpy.zeros((9, 8, 2), dtype=numpy.int64)
+    counts = numpy.zeros(9, dtype=numpy.int64)
+    for (x_dir, y_dir), cells in headings.items():
+        heading = (x_dir + 1) * 3 + (y_dir + 1)
+        offsets[heading, :len(cells)] = cells
+        counts[heading] = len(cells)
+
+    return offsets, counts
+
+
+OFFSETS, OFFSET_COUNTS = _build_offsets()
+
+# Bit of each candidate index (k) in the masks of move_masks() and the indices set in each mask, in increasing order
+BITS = numpy.arange(8, dtype=numpy.uint8)
+SET_BITS = [tuple(k for k in range(8) if mask >> k & 1) for mask in range(256)]
+
+# Ants per cell and colony from which the python backend looks moves up in per-step tables (see table_masks()) rather
+# than gathering the cells around every ant (see move_masks()). Both take about the same time at this density.
+TABLE_DENSITY = 1.5
+
+
+def move_masks(xs, ys, headings, home, colonies, border, resources, pheromones, width, height):
+    """Vectorised equivalent of movement_options() for the python backend. For ant i, heading into
+    ``headings[i]`` ((x_dir + 1) * 3 + (y_dir + 1)), it returns 8-bit masks whose bit k is set if candidate
+    OFFSETS[headings[i], k] of the ant:
+        valid[i] - lies on the grid and is not blocked by ``border``.
+        with_resources[i] - is valid and contains resources.
+        best[i] - is valid and has the strongest pheromone of the ant's mode among the valid candidates.
+    Only the cells around the ants are read, so the cost grows with the number of ants rather than the grid."""
+    offsets = OFFSETS[headings]
+    x = xs[:, None] + offsets[..., 0]
+    y = ys[:, None] + offsets[..., 1]
+    inside = (BITS[None, :] < OFFSET_COUNTS[headings][:, None]) & (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    cells = numpy.where(inside, y * width + x, 0)
+
+    valid = inside & (border[cells] > 0)
+    with_resources = valid & (resources[cells] > 0.0)
+    values = numpy.where(valid, pheromones[colonies[:, None], home[:, None].astype(numpy.int64), cells], -numpy.inf)
+    best = valid & (values == values.max(axis=1, keepdims=True))
+
+    return tuple((mask.astype(numpy.uint8) << BITS).sum(axis=1, dtype=numpy.uint8)
+                 for mask in (valid, with_resources, best))
+
+
+def shift(values: numpy.ndarray, dx: int, dy: int, fill) -> numpy.ndarray:
+    """Returns an array whose [..., y, x] entry is ``values[..., y + dy, x + dx]``, or ``fill`` outside the grid."""
+    height, width = values.shape[-2:]
+    shifted = numpy.full(values.shape, fill, dtype=values.dtype)
+    shifted[..., max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)] = \
+        values[..., max(0, dy):height + min(0, dy), max(0, dx):width + min(0, dx)]
+    return shifted
+
+
+def candidate_masks(allowed: numpy.ndarray) -> numpy.ndarray:
+    """Returns the candidate cells of every cell and heading as 8-bit masks of shape (..., 9, height, width) for
+    ``allowed`` of shape (..., height, width). Bit k of entry [..., h, y, x] is set if candidate OFFSETS[h, k] of cell
+    (x, y) lies on the grid and is allowed."""
+    shifted = {}
+    masks = numpy.zeros(allowed.shape[:-2] + (9,) + allowed.shape[-2:], dtype=numpy.uint8)
+
+    for heading in range(9):
+        for k in range(OFFSET_COUNTS[heading]):
+            dx, dy = OFFSETS[heading, k]
+            if (dx, dy) not in shifted:
+                shifted[dx, dy] = shift(allowed, dx, dy, False).astype(numpy.uint8)
+            masks[..., heading, :, :] |= shifted[dx, dy] << k
+
+    return masks
+
+
+def best_move_table(fields: numpy.ndarray, valid: numpy.ndarray) -> numpy.ndarray:
+    """Returns, as 8-bit masks of shape (..., 9, height, width), the candidate cells with the strongest pheromone of
+    ``fields`` (..., height, width) among the ``valid`` candidates (see candidate_masks()) of every cell and heading.
+    Ties set several bits."""
+    shifted = {}
+    table = numpy.zeros(fields.shape[:-2] + (9,) + fields.shape[-2:], dtype=numpy.uint8)
+
+    for heading in range(9):
+        candidates = []
+        for k in range(OFFSET_COUNTS[heading]):
+            dx, dy = OFFSETS[heading, k]
+            if (dx, dy) not in shifted:
+                shifted[dx, dy] = shift(fields, dx, dy, -numpy.inf)
+            allowed = (valid[heading] >> k & 1).astype(bool)
+            candidates.append((allowed, numpy.where(allowed, shifted[dx, dy], -numpy.inf)))
+
+        best = numpy.maximum.reduce([candidate for _, candidate in candidates])
+        for k, (allowed, candidate) in enumerate(candidates):
+            table[..., heading, :, :] |= ((candidate == best) & allowed).view(numpy.uint8) << k
+
+    return table
+
+
+def table_masks(xs, ys, headings, home, colonies, valid, resources, pheromones, width, height):
+    """Equivalent of move_masks() that looks the masks of every ant up in tables computed for every cell and heading:
+    ``valid`` (see candidate_masks(), of shape (9, cells)), the valid candidates with resources and, per colony and
+    field of ``pheromones``, the best candidates (see best_move_table()). Building the tables costs the same however
+    many ants there are, so this pays off once ants are dense enough to read the same neighbourhoods many times."""
+    with_resources = candidate_masks(resources.reshape(height, width) > 0.0).reshape(9, -1) & valid
+    best = best_move_table(pheromones.reshape(pheromones.shape[:2] + (height, width)),
+                           valid.reshape(9, height, width)).reshape(pheromones.shape[:2] + (9, -1))
+
+    cells = ys * width + xs
+    fields = home.astype(numpy.int64)
+    return valid[headings, cells], with_resources[headings, cells], best[colonies, fields, headings, cells]
+
+
+@jit
+def movement_options(xs, ys, x_dirs, y_dirs, home, colonies, border, resources, pheromones, width, offsets,
+                     offset_counts):
+    """Computes the deterministic part of MovementSystem for every ant. ``pheromones`` is the model's pheromone array
+    with the cells of each field flattened, (colonies, 2, cells), and ant i follows the fields of colony
+    ``colonies[i]``. For ant i it returns:
+        cells[i, :counts[i]] - the candidate cells the ant can move to.
+        with_resources[i, :resource_counts[i]] - indices of the candidate cells that contain resources.
+        best[i, :best_counts[i]] - indices of the candidate cells with the strongest pheromone of the ant's mode.
+    The random choices between these options are left to the caller."""
+    ant_count = len(xs)
+    cells = numpy.zeros((ant_count, 8, 2), dtype=numpy.int64)
+    counts = numpy.zeros(ant_count, dtype=numpy.int64)
+    with_resources = numpy.zeros((ant_count, 8), dtype=numpy.int64)
+    resource_counts = numpy.zeros(ant_count, dtype=numpy.int64)
+    best = numpy.zeros((ant_count, 8), dtype=numpy.int64)
+    best_counts = numpy.zeros(ant_count, dtype=numpy.int64)
+
+    for i in range(ant_count):
+        heading = (x_dirs[i] + 1) * 3 + (y_dirs[i] + 1)
+        tcells = pheromones[colonies[i], 1 if home[i] else 0]
+        max_p = -numpy.inf
+
+        for k in range(offset_counts[heading]):
+            x = xs[i] + offsets[heading, k, 0]
+            y = ys[i] + offsets[heading, k, 1]
+            if x < 0 or x >= width or y < 0 or y >= width or border[y * width + x] <= 0:
+                continue
+
+            n = counts[i]
+            cells[i, n, 0] = x
+            cells[i, n, 1] = y
+            counts[i] += 1
+
+            if resources[y * width + x] > 0.0:
+                with_resources[i, resource_counts[i]] = n
+                resource_counts[i] += 1
+
+            p = tcells[y * width + x]
+            if p > max_p:
+                max_p = p
+                best_counts[i] = 0
+            if p == max_p:
+                best[i, best_counts[i]] = n
+                best_counts[i] += 1
+
+    return cells, counts, with_resources, resource_counts, best, best_counts
+
+
+@jit
+def deposit(xs, ys, home, x_dirs, y_dirs, colonies, nests, pheromones, resources, collected, width, deposit_rate):
+    """Compiled equivalent of the agent loop of PheromoneSystem. Ants are processed in the order they are supplied and
+    ant i belongs to colony ``colonies[i]``, whose nest is centred on ``nests[colonies[i]]``. ``home``, ``x_dirs``,
+    ``y_dirs``, ``pheromones`` (colonies, 2, cells), ``resources`` and the per-colony tallies of delivered resources
+    ``collected`` are updated in place."""
+    for i in range(len(xs)):
+        pos_id = ys[i] * width + xs[i]
+        colony = colonies[i]
+
+        if home[i]:
+            if abs(xs[i] - nests[colony, 0]) < 3 and abs(ys[i] - nests[colony, 1]) < 3:
+                home[i] = False
+                collected[colony] += 1
+                x_dirs[i] = 0
+                y_dirs[i] = 0
+
+            pheromones[colony, 0, pos_id] += deposit_rate
+
+        elif resources[pos_id] > 0.0:
+            resources[pos_id] -= 1
+            home[i] = True
+            pheromones[colony, 1, pos_id] += deposit_rate
+            x_dirs[i] = 0
+            y_dirs[i] = 0
+        else:
+            pheromones[colony, 1, pos_id] += deposit_rate
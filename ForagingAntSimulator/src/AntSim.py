@@ -2,269 +2,515 @@ import math
 import numpy
 
 import ECAgent.Core as Core
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
 
 from ECAgent.Environments import GridWorld, PositionComponent, discreteGridPosToID
-from ECAgent.Collectors import Collector
-from PIL import Image
-from scipy.ndimage import gaussian_filter
+
+import AntKernels
+import AsyncCollection
+import GridLayers
+import RandomStreams
 
 
 class DirectionComponent(Core.Component):
+
+    __slots__ = ['x', 'y']
+
     def __init__(self, agent: Core.Agent, model: Core.Model):
         super().__init__(agent, model)
-        self.x = self.model.random.randint(-1, 1)
-        self.y = self.model.random.randint(-1, 1)
+        self.x = self.model.rng.buffered('agents').randrange(3) - 1
+        self.y = self.model.rng.buffered('agents').randrange(3) - 1
 
 
 class ModeComponent(Core.Component):
+
+    __slots__ = ['home']
+
     def __init__(self, agent: Core.Agent, model: Core.Model):
         super().__init__(agent, model)
         self.home = False
 
 
+class ColonyComponent(Core.Component):
+
+    __slots__ = ['colony']
+
+    def __init__(self, agent: Core.Agent, model: Core.Model, colony: int):
+        super().__init__(agent, model)
+        self.colony = colony
+
+
 class CollectedComponent(Core.Component):
-    def __init__(self, agent: Core.Agent, model: Core.Model):
+    """The resources delivered to the nest of every colony. ``colonies[c]`` is the tally of colony c."""
+
+    __slots__ = ['colonies']
+
+    def __init__(self, agent: Core.Agent, model: Core.Model, colonies: int = 1):
         super().__init__(agent, model)
-        self.collected_resources = 0
+        self.colonies = numpy.zeros(colonies, dtype=numpy.int64)
+
+    @property
+    def collected_resources(self) -> int:
+        """The resources delivered by all colonies."""
+        return int(self.colonies.sum())
 
 
 class Ant(Core.Agent):
 
-    pheromone_deposit_rate = 0.25
-    ant_counter = 0
+    __slots__ = []
 
-    def __init__(self, model: Core.Model, energy: float = None):
-        super().__init__('a{}'.format(Ant.ant_counter), model)
+    def __init__(self, model: Core.Model, colony: int = 0):
+        super().__init__(model.ant_counter, model)
 
         self.addComponent(DirectionComponent(self, model))
         self.addComponent(ModeComponent(self, model))
+        self.addComponent(ColonyComponent(self, model, colony))
 
-        Ant.ant_counter += 1
+        model.ant_counter += 1
 
 
 class MovementSystem(Core.System):
 
-    switch_frequency = 50
-
     def __init__(self, id: str, model: Core.Model, switch_frequency : int):
         super().__init__(id, model)
 
-        MovementSystem.switch_frequency = switch_frequency
-
-        def pheromone_generator(pos, cells):
-            return 0.0
-
-        model.environment.addCellComponent('f_pheromones', pheromone_generator)
-        model.environment.addCellComponent('h_pheromones', pheromone_generator)
-
+        self.switch_frequency = switch_frequency
+        # Valid candidate cells of every cell and heading for each border layer, see AntKernels.candidate_masks()
+        self.valid_moves = {}
+
+    def move_compiled(self, pheromones, border_id : str):
+        """Array equivalent of the agent loop in execute(). The movement options of every ant are computed by a compiled
+        kernel and only the random choices between them are made here, in the same order as the python backend."""
+        agents = self.model.environment.getAgents()
+        count = len(agents)
+
+        xs = numpy.fromiter((a[PositionComponent].x for a in agents), dtype=numpy.int64, count=count)
+        ys = numpy.fromiter((a[PositionComponent].y for a in agents), dtype=numpy.int64, count=count)
+        x_dirs = numpy.fromiter((a[DirectionComponent].x for a in agents), dtype=numpy.int64, count=count)
+        y_dirs = numpy.fromiter((a[DirectionComponent].y for a in agents), dtype=numpy.int64, count=count)
+        home = numpy.fromiter((a[ModeComponent].home for a in agents), dtype=numpy.bool_, count=count)
+        colonies = numpy.fromiter((a[ColonyComponent].colony for a in agents), dtype=numpy.int64, count=count)
+
+        cells, counts, with_resources, resource_counts, best, best_counts = AntKernels.movement_options(
+            xs, ys, x_dirs, y_dirs, home, colonies, self.model.layers[border_id], self.model.layers['resources'],
+            pheromones, self.model.environment.width,
+            AntKernels.OFFSETS, AntKernels.OFFSET_COUNTS)
+
+        # randrange(n) draws the same index as choice() does on a list of length n
+        random = self.model.rng.buffered(self.id)
+        for i, agent in enumerate(agents):
+
+            if counts[i] == 0:
+                agent[DirectionComponent].x = 0
+                agent[DirectionComponent].y = 0
+                continue
 
-    def get_neighbouring_cells(self, x_pos : int, y_pos : int, x_dir : int, y_dir : int, border_id : str):
+            if resource_counts[i] > 0 and not home[i]:
+                k = with_resources[i, random.randrange(resource_counts[i])]
+            elif random.random() < 0.05:
+                k = random.randrange(counts[i])
+            else:
+                k = best[i, random.randrange(best_counts[i])]
 
-        upper_bound = self.model.environment.width
+            newX = int(cells[i, k, 0])
+            newY = int(cells[i, k, 1])
 
-        if x_dir == 0 and y_dir == 0:
-            candidate_cells = [(-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1)]
-        elif x_dir == -1 and y_dir == 0:
-            candidate_cells = [(-1, 0), (-1, 1), (-1, -1)]
-        elif x_dir == -1 and y_dir == 1:
-            candidate_cells = [(-1, 0), (-1, 1), (0, 1)]
-        elif x_dir == 0 and y_dir == 1:
-            candidate_cells = [(-1, 1), (0, 1), (1, 1)]
-        elif x_dir == 1 and y_dir == 1:
-            candidate_cells = [(0, 1), (1, 1), (1, 0)]
-        elif x_dir == 1 and y_dir == 0:
-            candidate_cells = [(1, 1), (1, 0), (1, -1)]
-        elif x_dir == 1 and y_dir == -1:
-            candidate_cells = [(1, 0), (1, -1), (0, -1)]
-        elif x_dir == 0 and y_dir == -1:
-            candidate_cells = [(1, -1), (0, -1), (-1, -1)]
-        else:
-            candidate_cells = [(-1, 0), (0, -1), (-1, -1)]
+            #Update Direction
+            agent[DirectionComponent].x = newX - agent[PositionComponent].x
+            agent[DirectionComponent].y = newY - agent[PositionComponent].y
 
-        return [(x_pos + i[0], y_pos + i[1]) for i in candidate_cells
-                if 0 <= x_pos + i[0] < upper_bound and 0 <= y_pos + i[1] < upper_bound
-                and self.model.environment.cells[border_id][
-                    discreteGridPosToID(x_pos + i[0], y_pos + i[1], upper_bound)] > 0]
+            # Update Position
+            agent[PositionComponent].x = newX
+            agent[PositionComponent].y = newY
 
     def execute(self):
 
-        # Get resources data
-        fcells = self.model.environment.cells['f_pheromones'].to_numpy()
-        hcells = self.model.environment.cells['h_pheromones'].to_numpy()
-
-        border_id = 'border1' if (self.model.systemManager.timestep // MovementSystem.switch_frequency) % 2 == 0 else 'border2'
-
-        for agent in self.model.environment.getAgents():
-
-            candidate_cells = self.get_neighbouring_cells(agent[PositionComponent].x, agent[PositionComponent].y,
-                                                          agent[DirectionComponent].x, agent[DirectionComponent].y,
-                                                          border_id)
-
+        # Get resources data, every ant follows the pheromone fields of its own colony
+        fields = self.model.pheromones.reshape(len(self.model.nests), 2, -1)
+        resource_cells = self.model.layers['resources']
+
+        border_id = 'border1' if (self.model.systemManager.timestep // self.switch_frequency) % 2 == 0 else 'border2'
+
+        if self.model.backend == 'numba':
+            self.move_compiled(fields, border_id)
+            return
+
+        agents = self.model.environment.getAgents()
+        count = len(agents)
+
+        xs = numpy.fromiter((a[PositionComponent].x for a in agents), dtype=numpy.int64, count=count)
+        ys = numpy.fromiter((a[PositionComponent].y for a in agents), dtype=numpy.int64, count=count)
+        headings = numpy.fromiter(((a[DirectionComponent].x + 1) * 3 + a[DirectionComponent].y + 1 for a in agents),
+                                  dtype=numpy.int64, count=count)
+        home = numpy.fromiter((a[ModeComponent].home for a in agents), dtype=numpy.bool_, count=count)
+        colonies = numpy.fromiter((a[ColonyComponent].colony for a in agents), dtype=numpy.int64, count=count)
+
+        # The options of every ant are computed at once, as 8-bit masks of candidates. Sparse ants gather the cells
+        # around them, while dense ants, which read the same neighbourhoods many times over, look their options up
+        # in tables computed once per step for every cell and heading
+        width, height = self.model.environment.width, self.model.environment.height
+        if count >= AntKernels.TABLE_DENSITY * width * height * len(self.model.nests):
+            # Border layers never change, so their candidate cells are only computed once
+            if border_id not in self.valid_moves:
+                self.valid_moves[border_id] = AntKernels.candidate_masks(
+                    self.model.layers.grid(border_id) > 0).reshape(9, -1)
+            valid, with_resources, best = AntKernels.table_masks(
+                xs, ys, headings, home, colonies, self.valid_moves[border_id], resource_cells, fields, width, height)
+        else:
+            valid, with_resources, best = AntKernels.move_masks(
+                xs, ys, headings, home, colonies, self.model.layers[border_id], resource_cells, fields, width, height)
 
+        # Choosing the n-th set bit of a mask draws the same candidate as choice() on the list of candidates
+        random = self.model.rng.buffered(self.id)
+        for i, agent in enumerate(agents):
 
-            if len(candidate_cells) == 0:
+            candidates = AntKernels.SET_BITS[valid[i]]
+            if len(candidates) == 0:
                 agent[DirectionComponent].x = 0
                 agent[DirectionComponent].y = 0
                 continue
 
             # First check for any resources
+            resources = AntKernels.SET_BITS[with_resources[i]]
 
-            cells_with_resources = [c for c in candidate_cells if self.model.environment.cells['resources'][
-                discreteGridPosToID(c[0], c[1], self.model.environment.width)] > 0.0
-            ]
-
-            if len(cells_with_resources) > 0 and not agent[ModeComponent].home:
-                newPos = self.model.random.choice(cells_with_resources)
-            elif self.model.random.random() < 0.05:
-                newPos = self.model.random.choice(candidate_cells)
+            if len(resources) > 0 and not home[i]:
+                k = random.choice(resources)
+            elif random.random() < 0.05:
+                k = random.choice(candidates)
             else:
-                pheromones = []
-
-                tcells = hcells if agent[ModeComponent].home else fcells
-
-                for c in candidate_cells:
-                    pheromones.append(tcells[discreteGridPosToID(c[0], c[1], self.model.environment.width)])
-
-                maxP = max(pheromones)
-                newPos = candidate_cells[self.model.random.choice([
-                    p for p in range(len(pheromones)) if pheromones[p] == maxP
-                ])]
+                k = random.choice(AntKernels.SET_BITS[best[i]])
 
             #Update Direction
-            agent[DirectionComponent].x = newPos[0] - agent[PositionComponent].x
-            agent[DirectionComponent].y = newPos[1] - agent[PositionComponent].y
+            agent[DirectionComponent].x = int(AntKernels.OFFSETS[headings[i], k, 0])
+            agent[DirectionComponent].y = int(AntKernels.OFFSETS[headings[i], k, 1])
 
             # Update Position
-            agent[PositionComponent].x = newPos[0]
-            agent[PositionComponent].y = newPos[1]
+            agent[PositionComponent].x += agent[DirectionComponent].x
+            agent[PositionComponent].y += agent[DirectionComponent].y
 
 
 class PheromoneSystem(Core.System):
-
-    def __init__(self, id : str, model : Core.Model, decay_rate : float, reset_freq, diffuse : bool):
+    """Decays (and optionally diffuses) the pheromone fields every step, then lets the ants deposit pheromones and
+    collect resources.
+
+    With ``lazy`` decay, the fields are not decayed as a whole. Every cell keeps the tick it was last updated at (in
+    ``ticks``) and the decays it missed since, ``decay_rate ** (tick - ticks)``, are only applied when the cell is used
+    again: each step refreshes the cells around the ants, which are the only cells deposits and movement read or write,
+    and every ``sweep_freq`` steps refresh() clears the rest of the fields. The cost of decay then grows with the
+    number of ants rather than the size of the grid. Values are the same as with eager decay up to rounding, but
+    between sweeps the cells away from the ants hold stale values, call refresh() before reading the whole fields. Lazy
+    decay cannot be combined with diffusion, which updates every cell."""
+
+    def __init__(self, id : str, model : Core.Model, decay_rate : float, reset_freq, diffuse : bool,
+                 lazy : bool = False, sweep_freq : int = 100):
         super().__init__(id, model)
 
+        if lazy and diffuse:
+            raise ValueError('Lazy pheromone decay cannot be combined with diffusion.')
+        if lazy and not 0.0 <= decay_rate <= 1.0:
+            raise ValueError('Lazy pheromone decay requires a decay rate between 0 and 1, not {}.'.format(decay_rate))
+
         self.decay_rate = decay_rate
         self.reset_freq = reset_freq
         self.diffuse = diffuse
-        model.environment.addComponent(CollectedComponent(self, model))
-
+        self.lazy = lazy
+        self.sweep_freq = sweep_freq
+        model.environment.addComponent(CollectedComponent(self, model, len(model.nests)))
+
+        # Scratch buffer for diffusion so the pheromone fields are never reallocated
+        self.diffused = model.layers.zeros(model.pheromones.shape)
+
+        # Number of decays applied so far and, with lazy decay, the number applied to each cell
+        self.tick = 0
+        self.ticks = model.layers.zeros(model.pheromones.shape, numpy.int64) if lazy else None
+
+    def refresh(self, fields=None, cells=None):
+        """Applies the decays that cells missed since they were last updated, zeroing the cells that fall below the
+        threshold. ``fields`` and ``cells`` index the (colony * 2 + field, cell) view of the pheromones, every cell is
+        refreshed if they are omitted. Only needed with lazy decay."""
+        pheromones = self.model.pheromones.reshape(-1, self.model.layers.width * self.model.layers.height)
+        ticks = self.ticks.reshape(pheromones.shape)
+        index = (fields, cells) if fields is not None else numpy.s_[:]
+
+        missed = self.tick - ticks[index]
+        values = pheromones[index] * numpy.power(self.decay_rate, missed)
+        # Cells that were already updated this tick were thresholded before their deposits, like eager decay
+        values[(values < 0.01) & (missed > 0)] = 0.0
+
+        pheromones[index] = values
+        ticks[index] = self.tick
+
+    def refresh_neighbourhoods(self):
+        """Refreshes both fields of the colony of every ant at the cells around the ant (including its own)."""
+        agents = self.model.environment.getAgents()
+        count = len(agents)
+        width, height = self.model.layers.width, self.model.layers.height
+
+        xs = numpy.fromiter((a[PositionComponent].x for a in agents), dtype=numpy.int64, count=count)
+        ys = numpy.fromiter((a[PositionComponent].y for a in agents), dtype=numpy.int64, count=count)
+        colonies = numpy.fromiter((a[ColonyComponent].colony for a in agents), dtype=numpy.int64, count=count)
+
+        # Cells repeated by neighbouring ants (or clipped at the edges) are refreshed once per copy to the same value
+        neighbours_x = numpy.clip(xs[:, None] + AntKernels.OFFSETS[4, :, 0], 0, width - 1)
+        neighbours_y = numpy.clip(ys[:, None] + AntKernels.OFFSETS[4, :, 1], 0, height - 1)
+        cells = numpy.concatenate([neighbours_x + neighbours_y * width, (xs + ys * width)[:, None]], axis=1)
+        fields, cells = numpy.broadcast_arrays(colonies[:, None, None] * 2 + numpy.arange(2)[None, :, None],
+                                               cells[:, None, :])
+
+        self.refresh(fields.ravel(), cells.ravel())
 
     def execute(self):
 
+        layers = self.model.layers
+
         if self.model.systemManager.timestep % self.reset_freq == 0:
-            self.model.environment.cells.update(
-                { 'resources' :numpy.copy(self.model.environment.cells['resource_template'].to_numpy())}
-            )
+            layers['resources'] = layers['resource_template']
+
+        pheromones = self.model.pheromones
+        self.tick += 1
+
+        if self.lazy:
+            # Only the cells around the ants are decayed now, the others when an ant reaches them or at the next sweep
+            if self.tick % self.sweep_freq == 0:
+                self.refresh()
+            else:
+                self.refresh_neighbourhoods()
+        else:
+            # Decay and diffuse the fields of every colony at once
+            pheromones *= self.decay_rate
 
-        # Get resources data
-        fcells = self.model.environment.cells['f_pheromones'].to_numpy() * self.decay_rate
-        hcells = self.model.environment.cells['h_pheromones'].to_numpy() * self.decay_rate
+            if self.diffuse:
+                # scipy is only imported by runs that diffuse pheromones
+                from scipy.ndimage import gaussian_filter
 
-        if self.diffuse:
-            for i, cells in enumerate([fcells, hcells]):
-                reshaped_env = cells.reshape(self.model.environment.width, self.model.environment.width)
-                reshaped_env = gaussian_filter(reshaped_env, sigma=1)
-                if i ==0:
-                    fcells = reshaped_env.flatten()
-                else:
-                    hcells = reshaped_env.flatten()
+                # A sigma of 0 leaves the colony and field axes alone, so every field is blurred on its own
+                gaussian_filter(pheromones, sigma=(0, 0, 1, 1), output=self.diffused)
+                pheromones[:] = self.diffused
 
-        fcells[fcells < 0.01] = 0.0
-        hcells[hcells < 0.01] = 0.0
+            pheromones[pheromones < 0.01] = 0.0
 
-        resource_cells = self.model.environment.cells['resources'].to_numpy()
+        resource_cells = layers['resources']
+        fields = pheromones.reshape(len(self.model.nests), 2, -1)
+
+        if self.model.backend == 'numba':
+            self.deposit_compiled(fields, resource_cells)
+        else:
+            self.deposit(fields, resource_cells)
+
+    def deposit(self, pheromones, resource_cells):
+        """Ants deposit pheromones, pick up resources and deliver them to the nest of their colony. Deposits are
+        gathered while the ants are processed and added to the fields of every colony in a single call."""
+        nests = self.model.nests.tolist()
+        tallies = self.model.environment[CollectedComponent].colonies
+        fields, cells = [], []
 
         for agent in self.model.environment.getAgents():
 
             posID = discreteGridPosToID(agent[PositionComponent].x, agent[PositionComponent].y,
                                         self.model.environment.width)
+            colony = agent[ColonyComponent].colony
 
             if agent[ModeComponent].home:
-                if 22 < agent[PositionComponent].x < 28 and 22 < agent[PositionComponent].y < 28:
+                nest_x, nest_y = nests[colony]
+                if abs(agent[PositionComponent].x - nest_x) < 3 and abs(agent[PositionComponent].y - nest_y) < 3:
                     agent[ModeComponent].home = False
-                    self.model.environment[CollectedComponent].collected_resources += 1
+                    tallies[colony] += 1
                     agent[DirectionComponent].x = 0
                     agent[DirectionComponent].y = 0
 
-                fcells[posID] += Ant.pheromone_deposit_rate
+                fields.append(colony * 2)
 
             elif resource_cells[posID] > 0.0:
                 resource_cells[posID] -= 1
                 agent[ModeComponent].home = True
-                hcells[posID] += Ant.pheromone_deposit_rate
+                fields.append(colony * 2 + 1)
                 agent[DirectionComponent].x = 0
                 agent[DirectionComponent].y = 0
             else:
-                hcells[posID] += Ant.pheromone_deposit_rate
+                fields.append(colony * 2 + 1)
 
-        self.model.environment.cells.update({'f_pheromones': fcells, 'h_pheromones' : hcells, 'resources' : resource_cells})
+            cells.append(posID)
 
+        # add.at adds repeated cells one deposit at a time, in the order the ants were processed
+        numpy.add.at(pheromones.reshape(-1, pheromones.shape[-1]), (fields, cells), self.model.deposit_rate)
 
-class DataCollector(Collector):
+    def deposit_compiled(self, pheromones, resource_cells):
+        """Array equivalent of deposit() that runs the agent loop as a compiled kernel."""
+        agents = self.model.environment.getAgents()
+        count = len(agents)
 
-    def __init__(self, id: str, model, image_write: bool):
-        super().__init__(id, model)
+        xs = numpy.fromiter((a[PositionComponent].x for a in agents), dtype=numpy.int64, count=count)
+        ys = numpy.fromiter((a[PositionComponent].y for a in agents), dtype=numpy.int64, count=count)
+        x_dirs = numpy.fromiter((a[DirectionComponent].x for a in agents), dtype=numpy.int64, count=count)
+        y_dirs = numpy.fromiter((a[DirectionComponent].y for a in agents), dtype=numpy.int64, count=count)
+        home = numpy.fromiter((a[ModeComponent].home for a in agents), dtype=numpy.bool_, count=count)
+        colonies = numpy.fromiter((a[ColonyComponent].colony for a in agents), dtype=numpy.int64, count=count)
 
-        self.image_write = image_write
-        self.custom_cmap = colors.LinearSegmentedColormap.from_list('',
-                                                                   ['black', 'white', 'green', 'red', 'blue'])
-
-    def collect(self):
+        AntKernels.deposit(xs, ys, home, x_dirs, y_dirs, colonies, self.model.nests, pheromones, resource_cells,
+                           self.model.environment[CollectedComponent].colonies, self.model.environment.width,
+                           self.model.deposit_rate)
 
-        if self.image_write:
-            size = self.model.environment.width
-            iteration = self.model.systemManager.timestep
-            border_id = 'border1' if (self.model.systemManager.timestep // MovementSystem.switch_frequency) % 2 == 0 else 'border2'
-            image = numpy.copy(self.model.environment.cells[border_id].to_numpy())
-            image[self.model.environment.cells['resources'].to_numpy() > 0.0] = 2
-            image = image.reshape(size,size)
+        for i, agent in enumerate(agents):
+            agent[ModeComponent].home = bool(home[i])
+            agent[DirectionComponent].x = int(x_dirs[i])
+            agent[DirectionComponent].y = int(y_dirs[i])
 
-            for agent in self.model.environment.getAgents():
-                x = agent[PositionComponent].x
-                y = agent[PositionComponent].y
-                image[y, x] = 4 if agent[ModeComponent].home else 3
 
-            fig, ax = plt.subplots()
-            ax.set_title('Environment at Iteration {}'.format(iteration))
-            ax.set_xlabel('x')
-            ax.set_ylabel('y')
-            ax.imshow(image, cmap=self.custom_cmap, interpolation='nearest', vmin = 0, vmax = 4)
+class DataCollector(AsyncCollection.AsyncCollector):
+    """Records the resources collected by all colonies every step, and by each colony in ``colony_records`` if there
+    are several. The records are appended on the simulation thread so stop conditions can read them straight away,
+    images of the environment are rendered by process()."""
 
-            fig.savefig('env{}'.format(iteration))
-            plt.close(fig)
+    def __init__(self, id: str, model, image_write: bool, asynchronous: bool = False):
+        super().__init__(id, model, asynchronous)
 
-        self.records.append(self.model.environment[CollectedComponent].collected_resources)
+        self.image_write = image_write
+        self.colony_records = []
+
+    def snapshot(self):
+        collected = self.model.environment[CollectedComponent]
+        self.records.append(collected.collected_resources)
+        if len(collected.colonies) > 1:
+            self.colony_records.append(collected.colonies.copy())
+
+        if not self.image_write:
+            return None
+
+        agents = self.model.environment.getAgents()
+        switch_frequency = self.model.systemManager.systems['move'].switch_frequency
+        border_id = 'border1' if (self.model.systemManager.timestep // switch_frequency) % 2 == 0 else 'border2'
+
+        return {
+            'iteration': self.model.systemManager.timestep,
+            'border': self.model.layers[border_id],
+            'resources': self.model.layers['resources'],
+            'x': numpy.fromiter((a[PositionComponent].x for a in agents), dtype=numpy.int64, count=len(agents)),
+            'y': numpy.fromiter((a[PositionComponent].y for a in agents), dtype=numpy.int64, count=len(agents)),
+            'home': numpy.fromiter((a[ModeComponent].home for a in agents), dtype=numpy.bool_, count=len(agents))
+        }
+
+    def process(self, snapshot: dict):
+        # matplotlib is only imported by runs that write images
+        import matplotlib.colors as colors
+        # process() may run on a background thread, where pyplot is not safe to use, so figures are drawn with Agg
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        custom_cmap = colors.LinearSegmentedColormap.from_list('', ['black', 'white', 'green', 'red', 'blue'])
+        size = self.model.environment.width
+        iteration = snapshot['iteration']
+        image = numpy.copy(snapshot['border'])
+        image[snapshot['resources'] > 0.0] = 2
+        image = image.reshape(size,size)
+        image[snapshot['y'], snapshot['x']] = numpy.where(snapshot['home'], 4, 3)
+
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        ax.set_title('Environment at Iteration {}'.format(iteration))
+        ax.set_xlabel('x')
+        ax.set_ylabel('y')
+        ax.imshow(image, cmap=custom_cmap, interpolation='nearest', vmin = 0, vmax = 4)
+
+        fig.savefig('env{}'.format(iteration))
+
+
+def default_nests(size: int, colonies: int) -> [(int, int)]:
+    """Returns the nest centres used when none are supplied: the original nest at (25, 25) for a single colony,
+    otherwise ``colonies`` nests spread evenly on a circle around the centre of the grid. The model moves them off
+    walls, see snap_nests()."""
+    if colonies == 1:
+        return [(25, 25)]
+
+    radius = size / 4
+    return [(size // 2 + round(radius * math.cos(2 * math.pi * c / colonies)),
+             size // 2 + round(radius * math.sin(2 * math.pi * c / colonies))) for c in range(colonies)]
+
+
+def nest_sites(walkable: numpy.ndarray) -> numpy.ndarray:
+    """Returns the (height, width) mask, indexed [y, x], of the cells a nest can be centred on given the ``walkable``
+    mask of the map: both the nest's cell and the cell its ants start on, (x - 1, y - 1), must be walkable."""
+    sites = numpy.zeros_like(walkable)
+    sites[1:, 1:] = walkable[1:, 1:] & walkable[:-1, :-1]
+    return sites
+
+
+def snap_nests(nests: [(int, int)], sites: numpy.ndarray) -> [(int, int)]:
+    """Returns the nest site (see nest_sites()) nearest to each of ``nests``."""
+    ys, xs = numpy.nonzero(sites)
+    if len(xs) == 0:
+        raise ValueError('The map has no walkable cell to place a nest on.')
+
+    return [(int(xs[i]), int(ys[i])) for i in (numpy.argmin((xs - x) ** 2 + (ys - y) ** 2) for x, y in nests)]
 
 
 class ForagingAntSimulator(Core.Model):
+    """The foraging ant simulator. ``init_ants`` ants are created for each colony, next to the colony's nest centred on
+    one of ``nests``. Nests must be placed on walkable cells of both border maps (see nest_sites()). When none are
+    supplied, the nests of default_nests() are moved to the nearest such cells. Colonies compete for the same resources
+    but each follows and lays its own pheromones.
+
+    If ``layer_cache`` is supplied, the layers and pheromone fields are memory-mapped from that directory (see
+    GridLayers.LayerStore) and the environment does not keep a row per cell, which allows maps far larger than
+    memory. If ``lazy_decay`` is True, pheromones are only decayed around the ants, see PheromoneSystem."""
 
     def __init__(self, file1 : str, file2 : str, file3 : str, size: int, init_ants: int, deposit_rate: float,
                  decay_rate: float, switch_frequency : int, reset_freq: int, diffuse : bool, mult : int,
-                 image_write: bool, seed: int):
+                 image_write: bool, seed: int, backend: str = 'python', async_collection: bool = False,
+                 colonies: int = 1, nests: [(int, int)] = None, layer_cache: str = None,
+                 lazy_decay: bool = False):
         super().__init__(seed=seed)
-        self.environment = GridWorld(size, size, self)
+        # Independent random streams for the systems of the model
+        self.rng = RandomStreams.RandomStreams(seed)
+        self.environment = GridWorld(size, size, self) if layer_cache is None else \
+            GridLayers.LayeredGridWorld(size, size, self)
 
-        # Add environment layers
-        self.environment.cells['border1'] = numpy.asarray(Image.open(file1).convert('L')).flatten() / 255.0
-        self.environment.cells['border2'] = numpy.asarray(Image.open(file2).convert('L')).flatten() / 255.0
-        self.environment.cells['resources'] = (1.0 - numpy.asarray(Image.open(file3).convert('L')).flatten() / 255.0) * mult
-        self.environment.cells['resource_template'] = numpy.copy(self.environment.cells['resources'].to_numpy())
-        # Add Systems
-        self.systemManager.addSystem(MovementSystem('move', self, switch_frequency))
-        self.systemManager.addSystem(PheromoneSystem('phero', self, decay_rate, reset_freq, diffuse))
-        self.systemManager.addSystem(DataCollector('collector', self, image_write))
+        # The numba backend is optional so fall back to python if it is not installed
+        if backend == 'numba' and not AntKernels.NUMBA_AVAILABLE:
+            self.logger.warning('Numba is not installed. Falling back to the python backend.')
+            backend = 'python'
+        self.backend = backend
 
         # Parameterize Agents
-        Ant.pheromone_deposit_rate = deposit_rate
-
-        # Create Agents at random locations
+        self.deposit_rate = deposit_rate
+        self.ant_counter = 0
+
+        # Add environment layers. Layers live in the model's LayerStore rather than the GridWorld's cells DataFrame, use
+        # self.layers.to_frame() to export them.
+        self.layers = GridLayers.LayerStore(size, size, layer_cache)
+        self.layers.add_image('border1', file1, lambda pixels: pixels / 255.0, 'border')
+        self.layers.add_image('border2', file2, lambda pixels: pixels / 255.0, 'border')
+        self.layers.add_image('resource_template', file3, lambda pixels: (1.0 - pixels / 255.0) * mult,
+                              'resources:{}'.format(mult))
+        self.layers.add('resources', self.layers['resource_template'], dtype=self.layers['resource_template'].dtype)
+
+        # Pheromone fields of every colony: [c, 0] is the food trail laid by the ants of colony c returning to the nest
+        # and [c, 1] the home trail laid by its searching ants. The fields of the first colony are also the
+        # 'f_pheromones' and 'h_pheromones' layers.
+        walkable = (self.layers['border1'] > 0) & (self.layers['border2'] > 0)
+        sites = nest_sites(walkable.reshape(size, size))
+        if nests is None:
+            nests = snap_nests(default_nests(size, colonies), sites)
+        else:
+            blocked = [(x, y) for x, y in nests if not (0 <= x < size and 0 <= y < size and sites[y, x])]
+            if len(blocked) > 0:
+                raise ValueError('Nests {} are not on walkable cells of the map, nearest walkable nests: {}.'.format(
+                    blocked, snap_nests(blocked, sites)))
+        self.nests = numpy.array(nests, dtype=numpy.int64)
+        self.pheromones = self.layers.zeros((len(self.nests), 2, size, size))
+        self.layers.attach('f_pheromones', self.pheromones[0, 0].reshape(-1))
+        self.layers.attach('h_pheromones', self.pheromones[0, 1].reshape(-1))
 
-        for _ in range(init_ants):
-            self.environment.addAgent(
-                Ant(self),
-                xPos = 24,
-                yPos = 24
-            )
+        # Add Systems
+        self.systemManager.addSystem(MovementSystem('move', self, switch_frequency))
+        self.systemManager.addSystem(PheromoneSystem('phero', self, decay_rate, reset_freq, diffuse, lazy_decay))
+        self.systemManager.addSystem(DataCollector('collector', self, image_write, async_collection))
+
+        # Create the Agents of every colony next to its nest
+
+        for colony, (x, y) in enumerate(self.nests.tolist()):
+            for _ in range(init_ants):
+                self.environment.addAgent(
+                    Ant(self, colony),
+                    xPos = x - 1,
+                    yPos = y - 1
+                )
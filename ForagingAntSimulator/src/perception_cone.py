@@ -1,9 +1,15 @@
+import os
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
 import argparse
 import matplotlib.colors as colors
 
 from ECAgent.Environments import PositionComponent, discreteGridPosToID
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Experiments', 'src'))
+
 from AntSim import ForagingAntSimulator, DirectionComponent
 
 
@@ -31,8 +37,7 @@ def get_neighbouring_cells(model, x_pos: int, y_pos: int, x_dir: int, y_dir: int
 
     return [(x_pos + i[0], y_pos + i[1]) for i in candidate_cells
             if 0 <= x_pos + i[0] < upper_bound and 0 <= y_pos + i[1] < upper_bound
-            and model.environment.cells[border_id][
-                discreteGridPosToID(x_pos + i[0], y_pos + i[1], upper_bound)] > 0]
+            and model.layers[border_id][discreteGridPosToID(x_pos + i[0], y_pos + i[1], upper_bound)] > 0]
 
 def main():
 
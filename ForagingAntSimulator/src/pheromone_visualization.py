@@ -1,9 +1,15 @@
+import os
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
 import argparse
 import matplotlib.colors as colors
 
 from ECAgent.Environments import PositionComponent, discreteGridPosToID
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Experiments', 'src'))
+
 from AntSim import ForagingAntSimulator, DirectionComponent
 
 def main():
@@ -53,7 +59,7 @@ def main():
 
             custom_cmap = colors.LinearSegmentedColormap.from_list('', ['white', 'black'])
 
-            image = np.copy(model.environment.cells['f_pheromones']).reshape(50, 50) #+ np.copy(model.environment.cells['h_pheromones']).reshape(50, 50)
+            image = np.copy(model.layers.grid('f_pheromones')) #+ np.copy(model.layers.grid('h_pheromones'))
 
             ax.imshow(image, cmap=custom_cmap, interpolation='nearest', vmin = 0.0)
             ax.set_aspect('auto')
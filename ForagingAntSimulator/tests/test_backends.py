@@ -0,0 +1,43 @@
+"""The numba kernels of the ant model must reproduce its python backend exactly for a fixed seed, with one or several
+colonies, with eager or lazy pheromone decay and with sparse or dense ants."""
+import hashlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.append(os.path.join(os.path.dirname(ROOT), 'Experiments', 'src'))
+
+import AntKernels
+from AntSim import ForagingAntSimulator
+
+RESOURCES = os.path.join(ROOT, 'resources')
+
+pytestmark = pytest.mark.skipif(not AntKernels.NUMBA_AVAILABLE, reason='numba is not installed')
+
+
+def run(backend: str, colonies: int, lazy_decay: bool = False, ants: int = 20, steps: int = 150):
+    model = ForagingAntSimulator(os.path.join(RESOURCES, 'NEST_STAGE1.png'), os.path.join(RESOURCES, 'NEST_STAGE2.png'),
+                                 os.path.join(RESOURCES, 'NEST_FOOD.png'), 50, ants, 0.25, 0.9, 50, 100, False, 1.0,
+                                 False, 3, backend, colonies=colonies, lazy_decay=lazy_decay)
+    for _ in range(steps):
+        model.systemManager.executeSystems()
+
+    collector = model.systemManager.systems['collector']
+    layers = hashlib.sha1(model.pheromones.tobytes() + model.layers['resources'].tobytes()).hexdigest()
+    return list(collector.records), [list(tally) for tally in collector.colony_records], layers
+
+
+@pytest.mark.parametrize('colonies', [1, 3])
+@pytest.mark.parametrize('lazy_decay', [False, True])
+def test_numba_matches_python(colonies, lazy_decay):
+    assert run('numba', colonies, lazy_decay) == run('python', colonies, lazy_decay)
+
+
+@pytest.mark.parametrize('colonies', [1, 2])
+def test_numba_matches_python_move_tables(colonies):
+    # Enough ants for the python backend to look moves up in tables, see AntKernels.TABLE_DENSITY
+    ants = int(AntKernels.TABLE_DENSITY * 50 * 50) + 1
+    assert run('numba', colonies, ants=ants, steps=20) == run('python', colonies, ants=ants, steps=20)
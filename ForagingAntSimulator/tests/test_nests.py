@@ -0,0 +1,41 @@
+"""Tests of the placement of the nests of the ant colonies."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.append(os.path.join(os.path.dirname(ROOT), 'Experiments', 'src'))
+
+from AntSim import ForagingAntSimulator, default_nests
+
+RESOURCES = os.path.join(ROOT, 'resources')
+
+
+def build(colonies: int = 1, nests=None) -> ForagingAntSimulator:
+    return ForagingAntSimulator(os.path.join(RESOURCES, 'NEST_STAGE1.png'), os.path.join(RESOURCES, 'NEST_STAGE2.png'),
+                                os.path.join(RESOURCES, 'NEST_FOOD.png'), 50, 10, 0.25, 0.6, 50, 100, False, 1.0,
+                                False, 5, colonies=colonies, nests=nests)
+
+
+def walkable(model: ForagingAntSimulator, x: int, y: int) -> bool:
+    cell = y * model.environment.width + x
+    return model.layers['border1'][cell] > 0 and model.layers['border2'][cell] > 0
+
+
+@pytest.mark.parametrize('colonies', [1, 2, 3, 4, 8])
+def test_default_nests_are_walkable(colonies):
+    model = build(colonies)
+    assert len(model.nests) == colonies
+    for x, y in model.nests.tolist():
+        assert walkable(model, x, y) and walkable(model, x - 1, y - 1)
+
+
+def test_single_nest_is_not_moved():
+    assert build().nests.tolist() == [list(nest) for nest in default_nests(50, 1)]
+
+
+def test_nests_on_walls_are_rejected():
+    with pytest.raises(ValueError):
+        build(nests=[(37, 25), (25, 25)])
@@ -1,6 +1,9 @@
 from random import randrange
 
+import numpy
+
 from ECAgent.Core import *
+from ECAgent.Collectors import Collector
 
 # This tutorial is based on the MESA introductory tutorial
 
@@ -8,24 +11,38 @@ from ECAgent.Core import *
 # A Model is the backbone of the entire framework
 class MoneyModel(Model):
 
-    def __init__(self, num_agents):
+    def __init__(self, num_agents, vectorized=False, seed=44, metrics=False):
         # The Model base class has two optional parameters environment and seed.
         # Because our model does not need a complex environment with positional information, we can just
         # use the default Environment class instead. We do this by not supplying our own environment obj.
         # We will, however, be supplying a seed to the random number generator so that we can compare outputs
         # and the end of the tutorial.
-        super().__init__(seed=44)
-
-        # After we've created our System, we now have to register it with SystemManager.
-        self.systemManager.addSystem(MoneySystem(self))
-        # Now, whenever we execute a cycle of our model, the MoneySystem will automatically run.
+        super().__init__(seed=seed)
+
+        # The vectorized mode is an optional extra (see VectorizedMoneySystem below). Instead of creating an agent
+        # for every person, it stores everyone's wealth in a single numpy array.
+        if vectorized:
+            self.wealth = numpy.ones(num_agents, dtype=numpy.int64)
+            self.systemManager.addSystem(VectorizedMoneySystem(self))
+        else:
+            # After we've created our System, we now have to register it with SystemManager.
+            self.systemManager.addSystem(MoneySystem(self))
+            # Now, whenever we execute a cycle of our model, the MoneySystem will automatically run.
+
+        # The metrics mode is another optional extra. The WealthCollector (see below) is registered after the money
+        # system so that it records the wealth distribution at the end of every step.
+        if metrics:
+            self.systemManager.addSystem(WealthCollector(self))
+
+        if vectorized:
+            return
 
         # Now we can add our agents
         # It is important to remember to add your Systems first and then your agents.
         for i in range(0, num_agents):
             # We are just giving the agents the id 'a' + the i value in the loop
             # This ensure that each agent will have a unique ID
-            self.environment.add_agent(MoneyAgent('a' + str(i), self))
+            self.environment.addAgent(MoneyAgent('a' + str(i), self))
 
     # This method will be used by our main method to run the simulation.
     def run(self):
@@ -36,6 +53,12 @@ class MoneyModel(Model):
             # increments the timestep counter by 1
             self.systemManager.executeSystems()
 
+    # This method returns the wealth of every agent as a numpy array, regardless of the mode the model runs in.
+    def get_wealth(self):
+        if hasattr(self, 'wealth'):
+            return self.wealth
+        return numpy.array([x.wealth for x in self.systemManager.getComponents(MoneyComponent)], dtype=numpy.int64)
+
 # This is our custom system class. It inherits from the base System class.
 class MoneySystem(System):
 
@@ -70,6 +93,60 @@ class MoneySystem(System):
                 other_agent.getComponent(MoneyComponent).wealth += 1
                 component.wealth -= 1
 
+# This is the system used by the vectorized mode of MoneyModel. Rather than looping over components, it applies a
+# whole step of transfers at once using numpy.
+class VectorizedMoneySystem(System):
+
+    def __init__(self, model: Model):
+        super().__init__("MONEY", model)
+        # numpy has its own random number generator so we seed it using the model's generator. This keeps the
+        # vectorized mode reproducible for a given model seed.
+        self.rng = numpy.random.default_rng(model.random.getrandbits(64))
+
+    def execute(self):
+        wealth = self.model.wealth
+
+        # Every agent with money at the start of the step gives one unit away. Note that, unlike MoneySystem, an
+        # agent that was broke at the start of the step cannot pass on money it receives during the same step.
+        givers = numpy.flatnonzero(wealth)
+        # Draw all of the recipients in one go (an agent may pick itself, just like getRandomAgent() can)
+        recipients = self.rng.integers(len(wealth), size=len(givers))
+
+        wealth[givers] -= 1
+        # bincount counts how many units each agent received, so agents picked more than once get all of them
+        wealth += numpy.bincount(recipients, minlength=len(wealth))
+
+# Collectors are Systems that record data about the model. This one records how unequal the wealth distribution is
+# after every step. It works with both modes of MoneyModel.
+class WealthCollector(Collector):
+
+    def __init__(self, model: Model, percentiles=(10, 50, 90, 99)):
+        super().__init__("WEALTH", model)
+        self.percentiles = percentiles
+
+    def collect(self):
+        wealth = self.model.get_wealth()
+        n = len(wealth)
+        total = wealth.sum()
+
+        # Wealth only takes small integer values, so rather than sorting the agents we count how many agents have
+        # each amount. counts[v] agents have wealth v and they occupy the ranks before[v] + 1 ... before[v] + counts[v]
+        # of the sorted wealth distribution.
+        counts = numpy.bincount(wealth)
+        before = numpy.cumsum(counts) - counts
+        values = numpy.arange(len(counts))
+
+        # The Gini coefficient is sum_i (2i - n - 1) * x_i / (n * total) over the sorted wealth x_1 <= ... <= x_n
+        gini = (values * counts * (2 * before + counts - n)).sum() / (n * total) if total > 0 else 0.0
+
+        record = {'timestep': self.model.systemManager.timestep, 'gini': gini}
+        for percentile in self.percentiles:
+            # The smallest wealth that at least percentile% of agents do not exceed
+            rank = max(1, int(numpy.ceil(percentile / 100 * n)))
+            record['p{}'.format(percentile)] = int(numpy.searchsorted(numpy.cumsum(counts), rank))
+
+        self.records.append(record)
+
 # This is our custom component class. It inherits from the base Component class.
 # Components are added to agents and are used by the SystemManager to determine which Agents
 # are affected by a specific system.
@@ -106,4 +183,9 @@ if __name__ == '__main__':
     # Now we can print out the wealth distribution of our model here is a simple way to do that using
     # list comprehension. We use the SystemManager.getComponents() to get all of the components registered to
     # a specific system
-    print ([x.wealth for x in model.systemManager.getComponents(MoneyComponent)])
\ No newline at end of file
+    print ([x.wealth for x in model.systemManager.getComponents(MoneyComponent)])
+
+    # The metrics mode records how unequal the wealth distribution is after every step
+    model = MoneyModel(1000, vectorized=True, metrics=True)
+    model.run()
+    print(model.systemManager.systems['WEALTH'].records[-1])
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""Tests of the tutorial's MoneyModel and its WealthCollector."""
+import os
+import sys
+
+import numpy
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from Tutorial import MoneyModel
+
+
+def ginis(vectorized: bool, agents: int = 2000, seed: int = 44) -> [float]:
+    model = MoneyModel(agents, vectorized=vectorized, seed=seed, metrics=True)
+    model.run()
+    assert model.get_wealth().sum() == agents
+    return [record['gini'] for record in model.systemManager.systems['WEALTH'].records]
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_gini_matches_sorted_wealth(vectorized):
+    model = MoneyModel(500, vectorized=vectorized, seed=3, metrics=True)
+    model.run()
+
+    wealth = numpy.sort(model.get_wealth())
+    ranks = numpy.arange(1, len(wealth) + 1)
+    gini = ((2 * ranks - len(wealth) - 1) * wealth).sum() / (len(wealth) * wealth.sum())
+    assert model.systemManager.systems['WEALTH'].records[-1]['gini'] == pytest.approx(gini)
+
+
+def test_vectorized_gini_matches_agent_based():
+    # Only the agent-based mode lets an agent that was broke at the start of a step pass on money it received earlier in
+    # the step, so the vectorized mode stays slightly more equal. Both move away from perfect equality alike.
+    agent_based, vectorized = ginis(False), ginis(True)
+    assert len(agent_based) == len(vectorized) == 10
+    assert numpy.allclose(agent_based, vectorized, atol=0.1)
+    assert agent_based[-1] > 0.5 and vectorized[-1] > 0.5
@@ -0,0 +1,168 @@
+import numpy
+
+
+def neighbour_counts(mask: numpy.ndarray) -> numpy.ndarray:
+    """Returns, for every cell, the number of cells set in ``mask`` within its Moore neighbourhood (excluding the cell
+    itself). This is a 3x3 convolution with zero padding, computed as the sum of the eight shifted views of ``mask``."""
+    width, height = mask.shape
+    padded = numpy.pad(mask.astype(numpy.int64), 1)
+    counts = numpy.zeros((width, height), dtype=numpy.int64)
+
+    for dx in range(3):
+        for dy in range(3):
+            if dx != 1 or dy != 1:
+                counts += padded[dx:dx + width, dy:dy + height]
+
+    return counts
+
+
+def similarity_field(map: numpy.ndarray, id: int) -> numpy.ndarray:
+    """Returns the similarity of every cell of ``map`` for households of colour ``id``. The similarity of a cell is the
+    fraction of its occupied neighbours that have colour ``id`` (0.0 if it has no occupied neighbours), the same value
+    MovementSystem.get_similarity() computes for a single cell."""
+    same = neighbour_counts(map == id)
+    occupied = neighbour_counts(map != 0)
+    return numpy.divide(same, occupied, out=numpy.zeros(map.shape), where=occupied > 0)
+
+
+class OccupancyGrid:
+    """The occupancy map of a SegregationModel along with the neighbour counts needed to compute similarities.
+
+    ``map[x, y]`` holds 0 for a vacant cell, 1 for a blue household and 2 for a red one and ``occupant[x, y]`` holds the
+    id of the household on the cell (-1 if vacant). ``counts[c, x, y]`` holds the number of neighbours of cell (x, y)
+    with colour c, where ``counts[0]`` counts all occupied neighbours. The grid is
+    owned by the model and only changes when households are placed or moved, so the cost of keeping it up to date scales
+    with the number of moves rather than the number of cells."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.map = numpy.zeros((size, size), dtype=numpy.int8)
+        self.occupant = numpy.full((size, size), -1, dtype=numpy.int64)
+        self.counts = numpy.zeros((3, size, size), dtype=numpy.int64)
+
+    def _update_neighbours(self, x: int, y: int, colour: int, delta: int):
+        x_slice = slice(max(0, x - 1), x + 2)
+        y_slice = slice(max(0, y - 1), y + 2)
+
+        for c in [0, colour]:
+            self.counts[c, x_slice, y_slice] += delta
+            # A cell is not its own neighbour
+            self.counts[c, x, y] -= delta
+
+    def place(self, x: int, y: int, colour: int, occupant: int):
+        """Places household ``occupant`` of ``colour`` on the vacant cell (x, y)."""
+        self.map[x, y] = colour
+        self.occupant[x, y] = occupant
+        self._update_neighbours(x, y, colour, 1)
+
+    def remove(self, x: int, y: int):
+        """Removes the household on cell (x, y)."""
+        self._update_neighbours(x, y, int(self.map[x, y]), -1)
+        self.map[x, y] = 0
+        self.occupant[x, y] = -1
+
+    def move(self, source: (int, int), destination: (int, int)):
+        """Moves the household on cell ``source`` to the vacant cell ``destination``."""
+        colour = int(self.map[source])
+        occupant = int(self.occupant[source])
+        self.remove(*source)
+        self.place(destination[0], destination[1], colour, occupant)
+
+    def occupants_near(self, x: int, y: int) -> [int]:
+        """Returns the ids of the households on cell (x, y) and its Moore neighbourhood."""
+        window = self.occupant[max(0, x - 1):x + 2, max(0, y - 1):y + 2]
+        return window[window >= 0].tolist()
+
+    def similarity(self, colour: int, x: int, y: int) -> float:
+        """Returns the similarity of cell (x, y) for a household of ``colour``. Equivalent to
+        MovementSystem.get_similarity() on the current map."""
+        count = self.counts[0, x, y]
+        return self.counts[colour, x, y] / count if count > 0 else 0.0
+
+    def similarity_field(self, colour: int) -> numpy.ndarray:
+        """Returns the similarity of every cell for a household of ``colour``. Equivalent to
+        SegregationGrid.similarity_field() on the current map, but computed from the maintained neighbour counts."""
+        return numpy.divide(self.counts[colour], self.counts[0], out=numpy.zeros(self.map.shape),
+                            where=self.counts[0] > 0)
+
+    def free_locations(self) -> [(int, int)]:
+        """Returns the vacant cells in row-major (x, y) order."""
+        return [(int(x), int(y)) for x, y in numpy.argwhere(self.map == 0)]
+
+
+class CellSet:
+    """A set of cells supporting O(1) insertion, removal and uniform random sampling. Cells are kept in a list and
+    removed by swapping them with the last cell of the list."""
+
+    def __init__(self):
+        self.cells = []
+        self.index = {}
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __contains__(self, cell: (int, int)) -> bool:
+        return cell in self.index
+
+    def add(self, cell: (int, int)):
+        if cell not in self.index:
+            self.index[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell: (int, int)):
+        position = self.index.pop(cell, None)
+        if position is not None:
+            last = self.cells.pop()
+            if position < len(self.cells):
+                self.cells[position] = last
+                self.index[last] = position
+
+    def sample(self, random) -> (int, int):
+        """Returns a uniformly drawn cell using ``random``, which can be any object with a ``random.Random`` style
+        randrange() method (e.g. a RandomStreams.PrefetchBuffer)."""
+        return self.cells[random.randrange(len(self.cells))]
+
+
+class VacancyIndex:
+    """Index of the vacant cells of an OccupancyGrid. Along with every vacant cell, the index keeps, for each colour,
+    the vacant cells whose similarity meets ``preference``. Call refresh() around cells whose neighbour counts changed
+    to keep the per-colour sets up to date."""
+
+    def __init__(self, grid: OccupancyGrid, preference: float):
+        self.grid = grid
+        self.preference = preference
+        self.free = CellSet()
+        self.satisfying = {1: CellSet(), 2: CellSet()}
+
+        for cell in grid.free_locations():
+            self.add(cell)
+
+    def add(self, cell: (int, int)):
+        """Adds the vacant ``cell`` to the index."""
+        self.free.add(cell)
+        self._evaluate(cell)
+
+    def remove(self, cell: (int, int)):
+        """Removes ``cell`` from the index, e.g. when a household claims it."""
+        self.free.discard(cell)
+        for cells in self.satisfying.values():
+            cells.discard(cell)
+
+    def _evaluate(self, cell: (int, int)):
+        for colour, cells in self.satisfying.items():
+            if self.grid.similarity(colour, cell[0], cell[1]) >= self.preference:
+                cells.add(cell)
+            else:
+                cells.discard(cell)
+
+    def refresh(self, x: int, y: int):
+        """Re-evaluates the vacant cells in the Moore neighbourhood of (x, y)."""
+        for i in range(max(0, x - 1), min(self.grid.size, x + 2)):
+            for j in range(max(0, y - 1), min(self.grid.size, y + 2)):
+                if (i, j) in self.free:
+                    self._evaluate((i, j))
+
+    def draw(self, colour: int, random) -> (int, int):
+        """Returns a uniformly drawn vacant cell that satisfies ``colour`` or, if there are none, any vacant cell."""
+        cells = self.satisfying[colour]
+        return cells.sample(random) if len(cells) > 0 else self.free.sample(random)
@@ -0,0 +1,29 @@
+# SegregationModel only uses these kernels when NUMBA_AVAILABLE, see Experiments/src/Backends.py
+from Backends import NUMBA_AVAILABLE, jit
+
+
+@jit
+def apply_moves(map, occupant, counts, moves):
+    """Compiled equivalent of calling OccupancyGrid.move() for every row (source x, source y, destination x,
+    destination y) of ``moves`` in order. ``map``, ``occupant`` and ``counts`` are updated in place."""
+    width, height = map.shape
+
+    for k in range(len(moves)):
+        for step in range(2):
+            if step == 0:
+                x, y = moves[k, 0], moves[k, 1]
+                colour = map[x, y]
+                household = occupant[x, y]
+                delta = -1
+            else:
+                x, y = moves[k, 2], moves[k, 3]
+                delta = 1
+
+            for i in range(max(0, x - 1), min(width, x + 2)):
+                for j in range(max(0, y - 1), min(height, y + 2)):
+                    if i != x or j != y:
+                        counts[0, i, j] += delta
+                        counts[colour, i, j] += delta
+
+            map[x, y] = colour if delta > 0 else 0
+            occupant[x, y] = household if delta > 0 else -1
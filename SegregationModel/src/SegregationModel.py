@@ -2,14 +2,19 @@ import math
 import numpy
 
 import ECAgent.Core as Core
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
 
 from ECAgent.Environments import GridWorld, PositionComponent, discreteGridPosToID
-from ECAgent.Collectors import Collector
+
+import AsyncCollection
+import SegregationGrid
+import SegregationKernels
+import RandomStreams
 
 
 class SegregationComponent(Core.Component):
+
+    __slots__ = ['location', 'blue']
+
     def __init__(self, agent: Core.Agent, model: Core.Model, location: (int, int), is_blue: bool):
         super().__init__(agent, model)
         self.location = location
@@ -18,16 +23,16 @@ class SegregationComponent(Core.Component):
 
 class Household(Core.Agent):
 
-    counter = 0
+    __slots__ = []
 
     def __init__(self, model: Core.Model, location: (int, int), is_blue: bool):
-        super().__init__(Household.counter, model)
+        super().__init__(model.household_counter, model)
         self.addComponent(
             SegregationComponent(
                 self, model, location, is_blue
         ))
 
-        Household.counter += 1
+        model.household_counter += 1
 
 
 class MovementSystem(Core.System):
@@ -76,100 +81,216 @@ class MovementSystem(Core.System):
 
         return matches / count if count > 0 else 0.0
 
-    def __init__(self, id: str, model: Core.Model, preference : float):
+    def __init__(self, id: str, model: Core.Model, preference : float, frontier : bool = False):
         super().__init__(id, model)
         self.preference = preference
+        self.moved = 0
+        # Moves made since the start of the run, which lets collectors that skip steps report every move
+        self.total_moved = 0
 
-    def execute(self):
-        map = numpy.zeros((self.model.size, self.model.size))
+        # In frontier mode only the households whose neighbourhood changed during the last step are evaluated. None
+        # means every household still has to be evaluated.
+        self.use_frontier = frontier
+        self.frontier = None
 
-        for agent in self.model.environment.getAgents():
-            ax, ay = agent[SegregationComponent].location
-            blue = agent[SegregationComponent].blue
-            map[ax][ay] = 1 if blue else 2
+    def execute(self):
+        self.moved = 0
+        grid = self.model.grid
+        vacancies = self.model.vacancies
 
-        free_locations = []
+        # Households only see the map as it was at the start of the step so moves are applied to the grid afterwards
+        moves = []
 
-        for x in range(self.model.size):
-            for y in range(self.model.size):
-                if map[x][y] == 0:
-                    free_locations.append((x,y))
+        # Households outside the frontier were happy when last evaluated and their neighbourhood has not changed since.
+        # Ids follow insertion order, so sorting the frontier visits households in the same order as a full pass.
+        if self.use_frontier and self.frontier is not None:
+            agents = [self.model.environment.agents[id] for id in sorted(self.frontier)]
+        else:
+            agents = self.model.environment.getAgents()
 
         # Move unhappy agents
-        for agent in self.model.environment.getAgents():
+        random = self.model.rng.buffered(self.id)
+        for agent in agents:
             ax, ay = agent[SegregationComponent].location
-            blue = agent[SegregationComponent].blue
+            colour = 1 if agent[SegregationComponent].blue else 2
 
-            if MovementSystem.get_similarity(1 if blue else 2, self.model.size, ax, ay, map
-                                             ) < self.preference:
-                self.model.random.shuffle(free_locations)
-                moved = None
-                for x ,y in free_locations:
-                    if MovementSystem.get_similarity(1 if blue else 2, self.model.size, x, y, map
-                                             ) >= self.preference:
-                        moved = (x, y)
-                        break
-
-                if moved is None:
-                    moved = self.model.random.choice(free_locations)
+            if grid.similarity(colour, ax, ay) < self.preference:
+                moved = vacancies.draw(colour, random)
 
                 agent[SegregationComponent].location = moved
-                free_locations.remove(moved)
-                free_locations.append((ax, ay))
+                vacancies.remove(moved)
+                vacancies.add((ax, ay))
+                moves.append((ax, ay, moved[0], moved[1]))
+                self.moved += 1
 
+        self.total_moved += self.moved
 
-class DataCollector(Collector):
+        if self.model.backend == 'numba':
+            SegregationKernels.apply_moves(grid.map, grid.occupant, grid.counts,
+                                           numpy.asarray(moves, dtype=numpy.int64).reshape(-1, 4))
+        else:
+            for ax, ay, x, y in moves:
+                grid.move((ax, ay), (x, y))
 
-    def __init__(self, id: str, model, image_write: bool):
-        super().__init__(id, model, priority=2)
-        self.image_write = image_write
-        self.custom_cmap = colors.LinearSegmentedColormap.from_list('',
-                                                                   ['white','blue', 'red'])
+        # Vacant cells next to a move may now satisfy a different colour
+        for ax, ay, x, y in moves:
+            vacancies.refresh(ax, ay)
+            vacancies.refresh(x, y)
+
+        if self.use_frontier:
+            self.frontier = set()
+            for ax, ay, x, y in moves:
+                self.frontier.update(grid.occupants_near(ax, ay))
+                self.frontier.update(grid.occupants_near(x, y))
 
-    def collect(self):
 
-        if self.image_write:
-            iteration = self.model.systemManager.timestep
+class DataCollector(AsyncCollection.AsyncCollector):
 
-            map = numpy.zeros((self.model.size, self.model.size))
-            for agent in self.model.environment.getAgents():
-                ax, ay = agent[SegregationComponent].location
-                blue = agent[SegregationComponent].blue
-                map[ax][ay] = 1 if blue else 2
+    def __init__(self, id: str, model, image_write: bool, asynchronous: bool = False):
+        super().__init__(id, model, asynchronous, priority=2)
+        self.image_write = image_write
 
-            fig, ax = plt.subplots()# width_ratios=[1, 2])
-            ax.set_title('Environment at Iteration {}'.format(iteration))
-            ax.set_xlabel('x')
-            ax.set_ylabel('y')
-            ax.imshow(map, cmap=self.custom_cmap, interpolation='nearest', vmin = 0, vmax = 2)
-            fig.savefig('env{}'.format(iteration), dpi=200)
-            plt.close(fig)
+    def snapshot(self):
+        if not self.image_write:
+            return None
+
+        return {'iteration': self.model.systemManager.timestep, 'map': self.model.grid.map}
+
+    def process(self, snapshot: dict):
+        # matplotlib is only imported by runs that write images
+        import matplotlib.colors as colors
+        # The figure is drawn on its own Agg canvas instead of through pyplot so it can be rendered off the main thread
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        custom_cmap = colors.LinearSegmentedColormap.from_list('', ['white','blue', 'red'])
+        iteration = snapshot['iteration']
+
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()# width_ratios=[1, 2])
+        ax.set_title('Environment at Iteration {}'.format(iteration))
+        ax.set_xlabel('x')
+        ax.set_ylabel('y')
+        ax.imshow(snapshot['map'], cmap=custom_cmap, interpolation='nearest', vmin = 0, vmax = 2)
+        fig.savefig('env{}'.format(iteration), dpi=200)
+
+
+class MetricsCollector(AsyncCollection.AsyncCollector):
+    """Collects segregation metrics every ``frequency`` steps. All metrics but the moves are computed from a snapshot of
+    the model's OccupancyGrid:
+        - the mean similarity of the households of each colour.
+        - the fraction of unhappy households.
+        - the number of moves made since the previous collection.
+        - the number, mean size, largest size and the ``quantiles`` (percentiles) of the sizes of the clusters
+          (8-connected groups of households) of each colour.
+    Records are kept in memory unless ``records`` is replaced by a RecordSink created with columns(), which streams them
+    to disk in columnar chunks and is closed along with the collector. If ``asynchronous`` is True, metrics are computed
+    on a background thread, see AsyncCollector."""
+
+    CLUSTER_STRUCTURE = numpy.ones((3, 3), dtype=int)
+
+    def __init__(self, id: str, model, frequency: int = 1, quantiles: (int, ...) = (50, 90, 99),
+                 asynchronous: bool = False):
+        super().__init__(id, model, asynchronous, frequency=frequency)
+        self.quantiles = quantiles
+        # Moves made by the movement system up to the previous collection
+        self.collected_moves = 0
+
+    def columns(self) -> dict:
+        """Returns the names and dtypes of the metrics of a record, e.g. for the columns of a RecordSink."""
+        columns = {'timestep': numpy.int64, 'moves': numpy.int64, 'unhappy': numpy.float64}
+        for name in ['blue', 'red']:
+            columns['{}_similarity'.format(name)] = numpy.float64
+            columns['{}_clusters'.format(name)] = numpy.int64
+            columns['{}_mean_cluster'.format(name)] = numpy.float64
+            columns['{}_largest_cluster'.format(name)] = numpy.int64
+            for quantile in self.quantiles:
+                columns['{}_cluster_p{}'.format(name, quantile)] = numpy.float64
+        return columns
+
+    def snapshot(self):
+        movement = self.model.systemManager.systems['move']
+        moves = movement.total_moved - self.collected_moves
+        self.collected_moves = movement.total_moved
+        return {
+            'timestep': self.model.systemManager.timestep,
+            'moves': moves,
+            'preference': movement.preference,
+            'map': self.model.grid.map
+        }
+
+    def process(self, snapshot: dict):
+        from scipy.ndimage import label
+
+        map = snapshot['map']
+        record = {'timestep': snapshot['timestep'], 'moves': snapshot['moves']}
+        households = 0
+        unhappy = 0
+
+        for colour, name in [(1, 'blue'), (2, 'red')]:
+            mask = map == colour
+            similarity = SegregationGrid.similarity_field(map, colour)[mask]
+            households += len(similarity)
+            unhappy += numpy.count_nonzero(similarity < snapshot['preference'])
+
+            labels, clusters = label(mask, structure=MetricsCollector.CLUSTER_STRUCTURE)
+            sizes = numpy.bincount(labels.ravel())[1:]
+
+            record['{}_similarity'.format(name)] = similarity.mean() if len(similarity) > 0 else 0.0
+            record['{}_clusters'.format(name)] = clusters
+            record['{}_mean_cluster'.format(name)] = sizes.mean() if clusters > 0 else 0.0
+            record['{}_largest_cluster'.format(name)] = sizes.max() if clusters > 0 else 0
+            percentiles = numpy.percentile(sizes, self.quantiles) if clusters > 0 else [0.0] * len(self.quantiles)
+            for quantile, size in zip(self.quantiles, percentiles):
+                record['{}_cluster_p{}'.format(name, quantile)] = size
+
+        record['unhappy'] = unhappy / households if households > 0 else 0.0
+        self.records.append(record)
+
+    def close(self):
+        super().close()
+        # Flush the records still buffered by a RecordSink
+        if hasattr(self.records, 'close'):
+            self.records.close()
 
 
 class SegregationModel(Core.Model):
 
     def __init__(self, size: int, init_blue: int, init_red: int, preference: float,
-                 seed: int, image_write: bool):
+                 seed: int, image_write: bool, backend: str = 'python', frontier: bool = False,
+                 async_collection: bool = False):
         super().__init__(seed=seed)
+        # Independent random streams for the systems of the model
+        self.rng = RandomStreams.RandomStreams(seed)
         self.size = size
+        self.household_counter = 0
+        self.grid = SegregationGrid.OccupancyGrid(size)
+
+        # The numba backend is optional so fall back to python if it is not installed
+        if backend == 'numba' and not SegregationKernels.NUMBA_AVAILABLE:
+            self.logger.warning('Numba is not installed. Falling back to the python backend.')
+            backend = 'python'
+        self.backend = backend
         # Add Systems
-        self.systemManager.addSystem(MovementSystem('move', self, preference))
-        self.systemManager.addSystem(DataCollector('collector', self, image_write))
-
-        locations = []
-        for x in range(size):
-            for y in range(size):
-                locations.append((x, y))
+        self.systemManager.addSystem(MovementSystem('move', self, preference, frontier))
+        self.systemManager.addSystem(DataCollector('collector', self, image_write, async_collection))
 
-        self.random.shuffle(locations)
+        locations = [(cell // size, cell % size) for cell in self.rng.stream('setup').permutation(size * size).tolist()]
         total = 0
 
         # Create Agents at random locations
         for _ in range(init_blue):
-            self.environment.addAgent(Household(self, locations[total], True))
+            household = Household(self, locations[total], True)
+            self.environment.addAgent(household)
+            self.grid.place(locations[total][0], locations[total][1], 1, household.id)
             total += 1
 
         # Create Agents at random locations
         for _ in range(init_red):
-            self.environment.addAgent(Household(self, locations[total], False))
+            household = Household(self, locations[total], False)
+            self.environment.addAgent(household)
+            self.grid.place(locations[total][0], locations[total][1], 2, household.id)
             total += 1
+
+        self.vacancies = SegregationGrid.VacancyIndex(self.grid, preference)
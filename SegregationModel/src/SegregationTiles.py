@@ -0,0 +1,205 @@
+import os
+import numpy
+
+import ECAgent.Core as Core
+
+from concurrent.futures import ThreadPoolExecutor
+
+import RandomStreams
+import SegregationGrid
+from SegregationModel import DataCollector
+
+
+def make_tiles(size: int, tile_size: int) -> [(int, int, int, int)]:
+    """Partitions a ``size`` x ``size`` grid into tiles (x0, x1, y0, y1) covering the cells [x0, x1) x [y0, y1)."""
+    bounds = [(start, min(size, start + tile_size)) for start in range(0, size, tile_size)]
+    return [(x0, x1, y0, y1) for x0, x1 in bounds for y0, y1 in bounds]
+
+
+def evaluate_tile(grid: SegregationGrid.OccupancyGrid, tile: (int, int, int, int), preference: float) -> dict:
+    """Recomputes the neighbour counts of the cells of ``tile`` and returns, as flat cell ids (x * size + y):
+        - 'unhappy': the occupied cells whose household's similarity is below ``preference``, for each colour.
+        - 'satisfying': the vacant cells whose similarity meets ``preference``, for each colour.
+        - 'vacant': every vacant cell.
+    The tile is read along with a one-cell halo so only the tile's own slice of ``grid.counts`` is written, which lets
+    tiles be evaluated concurrently."""
+    x0, x1, y0, y1 = tile
+    hx, hy = max(0, x0 - 1), max(0, y0 - 1)
+    window = grid.map[hx:min(grid.size, x1 + 1), hy:min(grid.size, y1 + 1)]
+    inner = (slice(x0 - hx, x1 - hx), slice(y0 - hy, y1 - hy))
+
+    cells = window[inner]
+    ids = numpy.arange(x0, x1)[:, None] * grid.size + numpy.arange(y0, y1)[None, :]
+    vacant = cells == 0
+
+    occupied = SegregationGrid.neighbour_counts(window != 0)[inner]
+    grid.counts[0, x0:x1, y0:y1] = occupied
+
+    result = {'unhappy': {}, 'satisfying': {}, 'vacant': ids[vacant]}
+    for colour in [1, 2]:
+        same = SegregationGrid.neighbour_counts(window == colour)[inner]
+        grid.counts[colour, x0:x1, y0:y1] = same
+        similarity = numpy.divide(same, occupied, out=numpy.zeros(same.shape), where=occupied > 0)
+
+        result['unhappy'][colour] = ids[(cells == colour) & (similarity < preference)]
+        result['satisfying'][colour] = ids[vacant & (similarity >= preference)]
+
+    return result
+
+
+def resolve_claims(targets: numpy.ndarray, keys: numpy.ndarray) -> numpy.ndarray:
+    """Returns a mask of the winning claims. When several claims target the same cell, the claim with the lowest key
+    wins (ties go to the earliest claim), so the outcome does not depend on how the claims were produced."""
+    order = numpy.lexsort((keys, targets))
+    first = numpy.ones(len(order), dtype=bool)
+    first[1:] = targets[order][1:] != targets[order][:-1]
+
+    winners = numpy.zeros(len(targets), dtype=bool)
+    winners[order[first]] = True
+    return winners
+
+
+class TiledMovementSystem(Core.System):
+    """Moves unhappy households on a grid partitioned into tiles of ``tile_size`` x ``tile_size`` cells. Every step has
+    three phases:
+        1. Proposal: every tile draws, for each of its unhappy households, a vacant cell from the cells that satisfy its
+           colour anywhere on the grid (or any vacant cell if none do) along with a random priority key.
+        2. Resolution: claims on the same cell are resolved in favour of the lowest key. Households that lost a claim
+           draw again from the cells nobody claimed, for up to ``rounds`` rounds.
+        3. Evaluation: moves are applied and every tile recomputes its neighbour counts, unhappy households and
+           satisfying vacancies for the next step.
+    Phases 1 and 3 run on a pool of ``workers`` threads (one task per tile), which close() stops once the run is over.
+    Random numbers are drawn from streams spawned per tile from the model's RandomStreams, so results depend on the
+    seed and tile size but not on the number of workers.
+
+    Unlike MovementSystem, every household sees the map as it was at the start of the step and cells vacated during a
+    step only become available on the next one."""
+
+    def __init__(self, id: str, model: Core.Model, preference: float, tile_size: int = 256, workers: int = None,
+                 rounds: int = 4):
+        super().__init__(id, model)
+        self.preference = preference
+        self.rounds = rounds
+        self.moved = 0
+        self.total_moved = 0
+
+        self.tiles = make_tiles(model.size, tile_size)
+        self.pool = ThreadPoolExecutor(max_workers=workers if workers is not None else os.cpu_count())
+        self.evaluation = None
+        self.evaluate()
+
+    def close(self):
+        """Stops the worker threads of the pool. The system cannot be executed afterwards."""
+        self.pool.shutdown()
+
+    def evaluate(self):
+        """Runs the evaluation phase over every tile."""
+        self.evaluation = list(self.pool.map(
+            lambda tile: evaluate_tile(self.model.grid, tile, self.preference), self.tiles))
+
+    @staticmethod
+    def propose(evaluation: dict, pools: dict, streams: RandomStreams.RandomStreams) -> (numpy.ndarray, numpy.ndarray,
+                                                                                         numpy.ndarray):
+        """Draws a target cell and a priority key for every unhappy household of a tile."""
+        rng = streams.stream('propose')
+        sources, targets = [], []
+
+        for colour in [1, 2]:
+            unhappy = evaluation['unhappy'][colour]
+            pool = pools[colour]
+            sources.append(unhappy)
+            targets.append(pool[rng.integers(len(pool), size=len(unhappy))] if len(pool) > 0 else
+                           numpy.full(len(unhappy), -1, dtype=numpy.int64))
+
+        sources, targets = numpy.concatenate(sources), numpy.concatenate(targets)
+        return sources, targets, rng.random(len(sources))
+
+    def execute(self):
+        self.moved = 0
+        grid = self.model.grid
+        map, occupant = grid.map.reshape(-1), grid.occupant.reshape(-1)
+
+        vacant = numpy.concatenate([result['vacant'] for result in self.evaluation])
+        satisfying = {colour: numpy.concatenate([result['satisfying'][colour] for result in self.evaluation])
+                      for colour in [1, 2]}
+        pools = {colour: cells if len(cells) > 0 else vacant for colour, cells in satisfying.items()}
+
+        # Every step spawns a stream per tile so draws do not depend on how tiles are scheduled
+        streams = self.model.rng.spawn(self.id, len(self.tiles))
+        rng = self.model.rng.stream(self.id)
+
+        # Phase 1: Proposals
+        proposals = list(self.pool.map(lambda args: TiledMovementSystem.propose(args[0], pools, args[1]),
+                                       zip(self.evaluation, streams)))
+        sources = numpy.concatenate([proposal[0] for proposal in proposals])
+        targets = numpy.concatenate([proposal[1] for proposal in proposals])
+        keys = numpy.concatenate([proposal[2] for proposal in proposals])
+
+        # Phase 2: Resolution
+        claimed = numpy.zeros(len(map), dtype=bool)
+        moves_from, moves_to = [], []
+
+        for round in range(self.rounds):
+            valid = targets >= 0
+            winners = valid & resolve_claims(numpy.where(valid, targets, -1 - numpy.arange(len(targets))), keys)
+            moves_from.append(sources[winners])
+            moves_to.append(targets[winners])
+            claimed[targets[winners]] = True
+
+            # Losers draw again from the cells nobody has claimed yet
+            sources = sources[~winners]
+            vacant = vacant[~claimed[vacant]]
+            if len(sources) == 0 or len(vacant) == 0 or round == self.rounds - 1:
+                break
+
+            colours = map[sources]
+            targets = numpy.full(len(sources), -1, dtype=numpy.int64)
+            for colour in [1, 2]:
+                satisfying[colour] = satisfying[colour][~claimed[satisfying[colour]]]
+                pool = satisfying[colour] if len(satisfying[colour]) > 0 else vacant
+                mask = colours == colour
+                targets[mask] = pool[rng.integers(len(pool), size=numpy.count_nonzero(mask))]
+            keys = rng.random(len(sources))
+
+        moves_from, moves_to = numpy.concatenate(moves_from), numpy.concatenate(moves_to)
+        map[moves_to] = map[moves_from]
+        occupant[moves_to] = occupant[moves_from]
+        map[moves_from] = 0
+        occupant[moves_from] = -1
+        self.moved = len(moves_from)
+        self.total_moved += self.moved
+
+        # Phase 3: Evaluation
+        self.evaluate()
+
+
+class TiledSegregationModel(Core.Model):
+    """SegregationModel for very large grids. Households are not ECAgent agents: they only exist as entries of the
+    model's OccupancyGrid, where ``grid.occupant`` holds their ids. Collectors that only rely on the grid and the
+    'move' system (DataCollector, MetricsCollector) work with both models."""
+
+    def __init__(self, size: int, init_blue: int, init_red: int, preference: float, seed: int, image_write: bool,
+                 tile_size: int = 256, workers: int = None, async_collection: bool = False):
+        super().__init__(seed=seed)
+        # Independent random streams for the systems of the model
+        self.rng = RandomStreams.RandomStreams(seed)
+        self.size = size
+        self.grid = SegregationGrid.OccupancyGrid(size)
+
+        # Place households at random locations
+        households = init_blue + init_red
+        locations = self.rng.stream('setup').permutation(size * size)[:households]
+        self.grid.map.reshape(-1)[locations[:init_blue]] = 1
+        self.grid.map.reshape(-1)[locations[init_blue:]] = 2
+        self.grid.occupant.reshape(-1)[locations] = numpy.arange(households)
+        self.household_counter = households
+
+        # Add Systems
+        self.systemManager.addSystem(TiledMovementSystem('move', self, preference, tile_size, workers))
+        self.systemManager.addSystem(DataCollector('collector', self, image_write, async_collection))
+
+    def close(self):
+        """Stops the worker threads of the movement system and of an asynchronous collector."""
+        for system in self.systemManager.systems.values():
+            if hasattr(system, 'close'):
+                system.close()
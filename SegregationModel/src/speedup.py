@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Experiments', 'src'))
+
+from SegregationModel import SegregationModel
+from SegregationTiles import TiledSegregationModel
+
+
+def time_model(builder, steps: int) -> (float, float):
+    """Returns the time taken to build the model returned by ``builder`` and its mean step time in seconds."""
+    start = time.perf_counter()
+    model = builder()
+    built = time.perf_counter()
+    for _ in range(steps):
+        model.systemManager.executeSystems()
+    step = (time.perf_counter() - built) / steps
+
+    if hasattr(model, 'close'):
+        model.close()
+    return built - start, step
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', help='Sizes of the environments.', nargs='+', default=[1000, 2000], type=int)
+    parser.add_argument('--density', help='Fraction of occupied cells.', default=0.9, type=float)
+    parser.add_argument('--preference', help='How similar an agents neighbours need to be.', default=0.5, type=float)
+    parser.add_argument('--steps', help='Number of timed steps.', default=5, type=int)
+    parser.add_argument('--tile-size', help='Size of the tiles.', default=256, type=int)
+    parser.add_argument('--workers', help='Worker counts of the tiled engine.', nargs='+', default=[1, 2, 4, 8],
+                        type=int)
+    parser.add_argument('--serial-size', help='Size of the serial model whose step time is extrapolated to every size.',
+                        default=200, type=int)
+    parser.add_argument('--serial-full', help='Build and time the serial engine at every size instead? (Building it is '
+                                              'quadratic in the number of households.)', action='store_true')
+    parser.add_argument('--no-serial', help='Skip the serial engine?', action='store_true')
+    parser.add_argument('--seed', help='Seed of random number generator.', default=345968, type=int)
+
+    parser = parser.parse_args()
+
+    def serial_model(size: int):
+        households = int(size * size * parser.density)
+        return SegregationModel(size, households // 2, households - households // 2, parser.preference, parser.seed,
+                                False)
+
+    print('{:<8}{:<14}{:>12}{:>16}{:>10}'.format('size', 'engine', 'build (s)', 'ms per step', 'speedup'))
+
+    # Steps of the serial engine cost about the same per household at every size, so unless --serial-full is supplied
+    # its step time is measured once on a small grid and scaled by the number of households of each size
+    reference = None
+    if not parser.no_serial and not parser.serial_full:
+        build, step = time_model(lambda: serial_model(parser.serial_size), parser.steps)
+        reference = step / int(parser.serial_size * parser.serial_size * parser.density)
+        print('{:<8}{:<14}{:>12.2f}{:>16.2f}{:>10}'.format(parser.serial_size, 'serial', build, step * 1000, ''))
+
+    for size in parser.sizes:
+        households = int(size * size * parser.density)
+        blue, red = households // 2, households - households // 2
+
+        serial, estimated = None, False
+        if parser.serial_full and not parser.no_serial:
+            build, serial = time_model(lambda: serial_model(size), parser.steps)
+            print('{:<8}{:<14}{:>12.2f}{:>16.2f}{:>10.2f}'.format(size, 'serial', build, serial * 1000, 1.0))
+        elif reference is not None:
+            serial, estimated = reference * households, True
+            print('{:<8}{:<14}{:>12}{:>16.2f}{:>10}'.format(size, 'serial (est.)', 'n/a', serial * 1000, '1.00*'))
+
+        for workers in parser.workers:
+            build, step = time_model(lambda: TiledSegregationModel(size, blue, red, parser.preference, parser.seed,
+                                                                   False, parser.tile_size, workers), parser.steps)
+            print('{:<8}{:<14}{:>12.2f}{:>16.2f}{:>10}'.format(
+                size, 'tiled x{}'.format(workers), build, step * 1000,
+                '{:.2f}{}'.format(serial / step, '*' if estimated else '') if serial is not None else 'n/a'))
+
+    if reference is not None:
+        print('* Estimated: relative to the serial step time measured at size {} and scaled by the number of households '
+              '(use --serial-full to measure it at every size).'.format(parser.serial_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""The numba kernels of the segregation model must reproduce its python backend exactly for a fixed seed, with and
+without the frontier."""
+import hashlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.append(os.path.join(os.path.dirname(ROOT), 'Experiments', 'src'))
+
+import SegregationKernels
+from SegregationModel import SegregationModel
+
+pytestmark = pytest.mark.skipif(not SegregationKernels.NUMBA_AVAILABLE, reason='numba is not installed')
+
+
+def run(backend: str, frontier: bool, steps: int = 20):
+    model = SegregationModel(30, 300, 300, 0.5, 7, False, backend, frontier)
+    moved = []
+    for _ in range(steps):
+        model.systemManager.executeSystems()
+        moved.append(model.systemManager.systems['move'].moved)
+
+    return moved, hashlib.sha1(model.grid.map.tobytes()).hexdigest()
+
+
+@pytest.mark.parametrize('frontier', [False, True])
+def test_numba_matches_python(frontier):
+    assert run('numba', frontier) == run('python', frontier)
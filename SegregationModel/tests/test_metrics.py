@@ -0,0 +1,42 @@
+"""Tests of the MetricsCollector of the segregation model."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.append(os.path.join(os.path.dirname(ROOT), 'Experiments', 'src'))
+
+from RecordSink import RecordSink, load_run
+from SegregationModel import SegregationModel, MetricsCollector
+
+
+def build(frequency: int):
+    model = SegregationModel(30, 300, 300, 0.6, 7, False)
+    metrics = MetricsCollector('metrics', model, frequency)
+    model.systemManager.addSystem(metrics)
+    return model, metrics
+
+
+def test_moves_accumulate_between_collections():
+    model, metrics = build(4)
+    moved = []
+    for _ in range(9):
+        model.systemManager.executeSystems()
+        moved.append(model.systemManager.systems['move'].moved)
+
+    assert [record['timestep'] for record in metrics.records] == [0, 4, 8]
+    assert [record['moves'] for record in metrics.records] == [moved[0], sum(moved[1:5]), sum(moved[5:9])]
+
+
+def test_records_stream_to_sink(tmp_path):
+    model, metrics = build(1)
+    metrics.records = RecordSink(str(tmp_path), metrics.columns(), chunk_size=2, run_id='run')
+    for _ in range(5):
+        model.systemManager.executeSystems()
+    metrics.close()
+
+    _, records = load_run(str(tmp_path / 'run'))
+    assert list(records['timestep']) == [0, 1, 2, 3, 4]
+    assert list(records.columns) == list(metrics.columns().keys())
+    assert (records['blue_cluster_p50'] <= records['blue_cluster_p99']).all()
+    assert (records['red_cluster_p99'] <= records['red_largest_cluster']).all()
@@ -2,52 +2,62 @@ import math
 import numpy
 
 import ECAgent.Core as Core
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
 
 from ECAgent.Environments import GridWorld, PositionComponent, discreteGridPosToID
-from ECAgent.Collectors import Collector
+
+import AsyncCollection
+import GridLayers
+import PredatorPreyKernels
+import RandomStreams
 
 
 class EnergyComponent(Core.Component):
+
+    __slots__ = ['energy']
+
     def __init__(self, agent: Core.Agent, model: Core.Model, energy: float):
         super().__init__(agent, model)
         self.energy = energy
 
 
+class SpeciesParameters:
+    """Parameters of a species. Each PredatorPreyModel owns its own SpeciesParameters so that models with different
+    parameters can run side by side in the same process."""
+
+    def __init__(self, gain: float, reproduce_rate: float):
+        self.gain = gain
+        self.reproduce_rate = reproduce_rate
+
+
 class Wolf(Core.Agent):
 
-    gain = 1.0
-    reproduce_rate = 0.01
-    wolf_counter = 0
+    __slots__ = []
 
     def __init__(self, model: Core.Model, energy: float = None):
-        super().__init__('w{}'.format(Wolf.wolf_counter), model)
+        super().__init__(model.agent_counter, model)
+        model.agent_counter += 1
 
         self.addComponent(
             EnergyComponent(
-                self, model, energy if energy is not None else model.random.random() * 2 * Wolf.gain
+                self, model,
+                energy if energy is not None else model.rng.buffered('agents').random() * 2 * model.wolf_params.gain
         ))
 
-        Wolf.wolf_counter += 1
-
 
 class Sheep(Core.Agent):
 
-    gain = 1.0
-    reproduce_rate = 0.01
-    sheep_counter = 0
+    __slots__ = []
 
     def __init__(self, model: Core.Model, energy: float = None):
-        super().__init__('s{}'.format(Sheep.sheep_counter), model)
+        super().__init__(model.agent_counter, model)
+        model.agent_counter += 1
 
         self.addComponent(
             EnergyComponent(
-                self, model, energy if energy is not None else model.random.random() * 2 * Sheep.gain
+                self, model,
+                energy if energy is not None else model.rng.buffered('agents').random() * 2 * model.sheep_params.gain
         ))
 
-        Sheep.sheep_counter += 1
-
 
 class MovementSystem(Core.System):
 
@@ -56,10 +66,15 @@ class MovementSystem(Core.System):
 
     def execute(self):
         upper_bound = self.model.environment.width -1
-        for agent in self.model.environment.getAgents():
+        agents = self.model.environment.getAgents()
+
+        # Draw the steps of every agent at once
+        steps = numpy.rint(2 * self.model.rng.stream(self.id).random((len(agents), 2)) - 1).astype(numpy.int64)
+
+        for agent, (dx, dy) in zip(agents, steps.tolist()):
             # Move within Moore Neighbourhood
-            newX = max(0, min(upper_bound, agent[PositionComponent].x + int(round(2* self.model.random.random() - 1))))
-            newY = max(0, min(upper_bound, agent[PositionComponent].y + int(round(2* self.model.random.random() - 1))))
+            newX = max(0, min(upper_bound, agent[PositionComponent].x + dx))
+            newY = max(0, min(upper_bound, agent[PositionComponent].y + dy))
             # Spend Energy
             agent[EnergyComponent].energy -= 1
 
@@ -68,30 +83,63 @@ class MovementSystem(Core.System):
 
 
 class ResourceConsumptionSystem(Core.System):
-
-    def __init__(self, id: str, model: Core.Model, regrow_time: int):
+    """Wolves eat sheep, sheep eat grass and eaten grass regrows. Every cell holds a regrowth countdown, drawn between 0
+    and ``regrow_time`` when its grass grows, and eaten grass regrows once the countdown of its cell runs out.
+
+    With the 'countdown' regrowth, the countdowns of every eaten cell are decremented each step and the whole grid is
+    scanned for the cells that regrow. With the 'wheel' regrowth, a cell is instead inserted, when its grass is eaten,
+    into the bucket of a timing wheel for the step it regrows at, so each step only regrows the cells of the current
+    bucket and draws countdowns for those alone. Grass maintenance then costs time proportional to the grass eaten
+    rather than the size of the grid. Both follow the same rules, but the random draws differ (the 'countdown' regrowth
+    draws a value for every cell each step), so runs are statistically equivalent rather than identical. The
+    'countdown' layer is not decremented by the 'wheel' regrowth."""
+
+    def __init__(self, id: str, model: Core.Model, regrow_time: int, regrowth: str = 'countdown'):
         super().__init__(id, model)
 
-        self.regrow_time = regrow_time
+        if regrowth not in ['countdown', 'wheel']:
+            raise ValueError('Unknown regrowth \'{}\', expected \'countdown\' or \'wheel\'.'.format(regrowth))
 
-        def resource_generator(pos, cells):
-            return 1 if model.random.random() < 0.5 else 0
-
-        # Generate the initial resources
-        model.environment.addCellComponent('resources', resource_generator)
+        self.regrow_time = regrow_time
+        self.regrowth = regrowth
 
-        def countdown_generator(pos, cells):
-            return int(model.random.random() * regrow_time)
+        cell_count = model.environment.width * model.environment.height
+        rng = model.rng.stream(id)
 
         # Generate the initial resources
-        model.environment.addCellComponent('countdown', countdown_generator)
-
-    def execute(self):
-
-        # Get resources data
-        resource_cells = self.model.environment.cells['resources'].to_numpy()
-        countdown_cells = self.model.environment.cells['countdown'].to_numpy()
-
+        model.layers.add('resources', rng.random(cell_count) < 0.5, dtype=numpy.int64)
+
+        # Generate the initial regrowth countdowns
+        model.layers.add('countdown', rng.random(cell_count) * regrow_time, dtype=numpy.int64)
+
+        if regrowth == 'wheel':
+            # Countdowns are below regrow_time, so a cell never waits more than a turn of the wheel
+            self.tick = 0
+            self.wheel = [[] for _ in range(max(regrow_time, 1))]
+            self.schedule(numpy.flatnonzero(model.layers['resources'] < 1))
+
+    def schedule(self, cells):
+        """Inserts the eaten ``cells`` into the buckets of the steps they regrow at. A cell regrows at the step its
+        countdown runs out, counting the current step, so a countdown below 2 regrows it straight away."""
+        delays = numpy.maximum(self.model.layers['countdown'][cells], 1) - 1
+        for delay in numpy.unique(delays).tolist():
+            self.wheel[(self.tick + delay) % len(self.wheel)].append(cells[delays == delay])
+
+    def regrow(self):
+        """Regrows the cells of the current bucket of the wheel, draws their next countdowns and turns the wheel."""
+        bucket = self.wheel[self.tick % len(self.wheel)]
+        self.tick += 1
+        if len(bucket) == 0:
+            return
+
+        cells = numpy.concatenate(bucket)
+        bucket.clear()
+        self.model.layers['resources'][cells] = 1
+        self.model.layers['countdown'][cells] = (self.model.rng.stream(self.id).random(len(cells)) *
+                                                 self.regrow_time).astype(numpy.int64)
+
+    def consume(self, resource_cells) -> [int]:
+        """Wolves eat sheep and sheep eat grass. Returns the ids of the eaten sheep."""
         eaten_sheep = []
 
         targets_at_pos = {}
@@ -103,39 +151,80 @@ class ResourceConsumptionSystem(Core.System):
                                         self.model.environment.width)
 
             # Is wolf or is sheep
-            if agent.id.startswith('w'):
+            if isinstance(agent, Wolf):
                 # Get all agents at position
 
                 if posID not in targets_at_pos:
                     targets_at_pos[posID] = self.model.environment.getAgentsAt(agent[PositionComponent].x, agent[PositionComponent].y)
 
                 for target in targets_at_pos[posID]:
-                    if target.id.startswith('s') and target.id not in eaten_sheep: # If sheep
+                    if isinstance(target, Sheep) and target.id not in eaten_sheep: # If sheep
                         eaten_sheep.append(target.id) # Mark Sheep for death
-                        agent[EnergyComponent].energy += Wolf.gain
+                        agent[EnergyComponent].energy += self.model.wolf_params.gain
                         break
 
             elif agent.id not in eaten_sheep:
                 # Check is grass is Alive
                 if resource_cells[posID] > 0:
                     # Consume and Gain Energy
-                    agent[EnergyComponent].energy += Sheep.gain
+                    agent[EnergyComponent].energy += self.model.sheep_params.gain
                     resource_cells[posID] = 0
 
+        return eaten_sheep
+
+    def consume_compiled(self, resource_cells) -> [int]:
+        """Array equivalent of consume() that runs the agent loop as a compiled kernel."""
+        agents = self.model.environment.getAgents()
+        width = self.model.environment.width
+
+        pos_ids = numpy.fromiter((discreteGridPosToID(a[PositionComponent].x, a[PositionComponent].y, width)
+                                  for a in agents), dtype=numpy.int64, count=len(agents))
+        is_wolf = numpy.fromiter((isinstance(a, Wolf) for a in agents), dtype=numpy.bool_, count=len(agents))
+        energy = numpy.fromiter((a[EnergyComponent].energy for a in agents), dtype=numpy.float64, count=len(agents))
+
+        eaten = PredatorPreyKernels.consume(pos_ids, is_wolf, energy, resource_cells, len(resource_cells),
+                                            self.model.wolf_params.gain, self.model.sheep_params.gain)
+
+        for agent, e in zip(agents, energy):
+            agent[EnergyComponent].energy = float(e)
+
+        return [agents[i].id for i in eaten]
+
+    def execute(self):
+
+        # Get resources data
+        resource_cells = self.model.layers['resources']
+        countdown_cells = self.model.layers['countdown']
+
+        if self.regrowth == 'wheel':
+            # Grass can only be eaten at the cells of the agents
+            agents = self.model.environment.getAgents()
+            width = self.model.environment.width
+            positions = numpy.fromiter((discreteGridPosToID(a[PositionComponent].x, a[PositionComponent].y, width)
+                                        for a in agents), dtype=numpy.int64, count=len(agents))
+            had_grass = resource_cells[positions] > 0
+
+        if self.model.backend == 'numba':
+            eaten_sheep = self.consume_compiled(resource_cells)
+        else:
+            eaten_sheep = self.consume(resource_cells)
+
         # Remove eaten sheep
         for sheep in eaten_sheep:
             self.model.environment.removeAgent(sheep)
 
+        if self.regrowth == 'wheel':
+            self.schedule(numpy.unique(positions[had_grass & (resource_cells[positions] < 1)]))
+            self.regrow()
+            return
+
         # Regrow Grass
         countdown_cells[resource_cells < 1] -= 1
         mask = countdown_cells < 1
         resource_cells[mask] = 1
 
-        countdown_cells = numpy.where(mask, numpy.asarray([
-            int(self.model.random.random() * self.regrow_time) for i in range(len(countdown_cells))
-        ]), countdown_cells)
-
-        self.model.environment.cells.update({'resources': resource_cells, 'countdown': countdown_cells})
+        numpy.copyto(countdown_cells, (self.model.rng.stream(self.id).random(len(countdown_cells)) *
+                                       self.regrow_time).astype(numpy.int64), where=mask)
 
 
 class BirthSystem(Core.System):
@@ -144,8 +233,12 @@ class BirthSystem(Core.System):
 
     def execute(self):
 
-        for agent in self.model.environment.getAgents():
-            if agent.id.startswith('w') and self.model.random.random() < Wolf.reproduce_rate:
+        agents = self.model.environment.getAgents()
+        # Two draws per agent: the first decides whether a wolf gives birth, the second whether any other agent does
+        draws = self.model.rng.stream(self.id).random((len(agents), 2)).tolist()
+
+        for agent, (wolf_draw, sheep_draw) in zip(agents, draws):
+            if isinstance(agent, Wolf) and wolf_draw < self.model.wolf_params.reproduce_rate:
 
                 agent[EnergyComponent].energy /= 2.0
 
@@ -156,7 +249,7 @@ class BirthSystem(Core.System):
                     yPos = agent[PositionComponent].y
                 )
 
-            elif self.model.random.random() < Sheep.reproduce_rate:
+            elif sheep_draw < self.model.sheep_params.reproduce_rate:
 
                 agent[EnergyComponent].energy /= 2.0
 
@@ -184,86 +277,124 @@ class DeathSystem(Core.System):
             self.model.environment.removeAgent(a)
 
 
-class DataCollector(Collector):
+class DataCollector(AsyncCollection.AsyncCollector):
+    """Records the sheep and wolf populations every step. The populations are recorded on the simulation thread so stop
+    conditions can read them straight away, images of the environment are rendered by process()."""
 
-    def __init__(self, id: str, model, image_write: bool):
-        super().__init__(id, model)
+    def __init__(self, id: str, model, image_write: bool, asynchronous: bool = False):
+        super().__init__(id, model, asynchronous)
 
         self.records = {'sheep': [], 'wolves': []}
         self.image_write = image_write
-        self.custom_cmap = colors.LinearSegmentedColormap.from_list('',
-                                                                   ['lightyellow', 'green','black', 'red'])
-
-    def collect(self):
-
-        self.records['sheep'].append(len([1 for a in self.model.environment.getAgents() if a.id.startswith('s')]))
-        self.records['wolves'].append(len([1 for a in self.model.environment.getAgents() if a.id.startswith('w')]))
-
-        if self.image_write:
-            size = self.model.environment.width
-            iteration = self.model.systemManager.timestep
-            image = numpy.copy(self.model.environment.cells['resources'].to_numpy()).reshape(size,size)
-            for agent in self.model.environment.getAgents():
-                x = agent[PositionComponent].x
-                y = agent[PositionComponent].y
-                if image[y, x] < 3 and agent.id.startswith('w'):
-                    image[y, x] = 3
-                else:
-                    image[y, x] = 2
-
-            fig, ax = plt.subplots(1, 2,)# width_ratios=[1, 2])
-            ax[0].set_title('Environment at Iteration {}'.format(iteration))
-            ax[0].set_xlabel('x')
-            ax[0].set_ylabel('y')
-            ax[0].imshow(image, cmap=self.custom_cmap, interpolation='nearest', vmin = 0, vmax = 3)
-
-            ax[1].set_title('Sheep and Wolf Populations in \nSimple Predator Prey Model')
-            ax[1].set_xlabel('Iterations')
-
-            iterations = numpy.arange(iteration + 1)
-            for prop in self.records:
-                ax[1].plot(iterations, self.records[prop], label=prop)
-
-            ax[1].legend(loc='lower right')
-            fig.set_figwidth(15)
-            fig.savefig('env{}'.format(iteration), dpi=200)
-            plt.close(fig)
+        # Populations plotted next to the images, kept apart from the records since process() may run on another thread
+        self.history = {'sheep': [], 'wolves': []}
+
+    def snapshot(self):
+        agents = self.model.environment.getAgents()
+        wolf = numpy.fromiter((isinstance(a, Wolf) for a in agents), dtype=numpy.bool_, count=len(agents))
+        wolves = int(numpy.count_nonzero(wolf))
+
+        self.records['sheep'].append(len(agents) - wolves)
+        self.records['wolves'].append(wolves)
+
+        if not self.image_write:
+            return None
+
+        return {
+            'iteration': self.model.systemManager.timestep,
+            'resources': self.model.layers.grid('resources'),
+            'x': numpy.fromiter((a[PositionComponent].x for a in agents), dtype=numpy.int64, count=len(agents)),
+            'y': numpy.fromiter((a[PositionComponent].y for a in agents), dtype=numpy.int64, count=len(agents)),
+            'wolf': wolf,
+            'sheep': len(agents) - wolves,
+            'wolves': wolves
+        }
+
+    def process(self, snapshot: dict):
+        # matplotlib is only imported by runs that write images
+        import matplotlib.colors as colors
+        # pyplot is not thread-safe and process() may run on the collector's worker thread, so the figure gets its own
+        # Agg canvas
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.history['sheep'].append(snapshot['sheep'])
+        self.history['wolves'].append(snapshot['wolves'])
+
+        custom_cmap = colors.LinearSegmentedColormap.from_list('', ['lightyellow', 'green','black', 'red'])
+        iteration = snapshot['iteration']
+        image = numpy.copy(snapshot['resources'])
+        for x, y, is_wolf in zip(snapshot['x'].tolist(), snapshot['y'].tolist(), snapshot['wolf'].tolist()):
+            if image[y, x] < 3 and is_wolf:
+                image[y, x] = 3
+            else:
+                image[y, x] = 2
+
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.subplots(1, 2,)# width_ratios=[1, 2])
+        ax[0].set_title('Environment at Iteration {}'.format(iteration))
+        ax[0].set_xlabel('x')
+        ax[0].set_ylabel('y')
+        ax[0].imshow(image, cmap=custom_cmap, interpolation='nearest', vmin = 0, vmax = 3)
+
+        ax[1].set_title('Sheep and Wolf Populations in \nSimple Predator Prey Model')
+        ax[1].set_xlabel('Iterations')
+
+        iterations = numpy.arange(len(self.history['sheep']))
+        for prop in self.history:
+            ax[1].plot(iterations, self.history[prop], label=prop)
+
+        ax[1].legend(loc='lower right')
+        fig.set_figwidth(15)
+        fig.savefig('env{}'.format(iteration), dpi=200)
 
 
 class PredatorPreyModel(Core.Model):
 
     def __init__(self, size: int, init_sheep: int, init_wolf: int, regrow_rate: int,
                  sheep_gain: float, wolf_gain: float, sheep_reproduce: float, wolf_reproduce: float,
-                 seed: int, image_write: bool):
+                 seed: int, image_write: bool, backend: str = 'python', async_collection: bool = False,
+                 regrowth: str = 'countdown'):
         super().__init__(seed=seed)
+        # Independent random streams for the systems of the model
+        self.rng = RandomStreams.RandomStreams(seed)
         self.environment = GridWorld(size, size, self)
+        # Cell layers live in a LayerStore rather than the GridWorld's cells DataFrame, use self.layers.to_frame() to
+        # export them.
+        self.layers = GridLayers.LayerStore(size, size)
+
+        # The numba backend is optional so fall back to python if it is not installed
+        if backend == 'numba' and not PredatorPreyKernels.NUMBA_AVAILABLE:
+            self.logger.warning('Numba is not installed. Falling back to the python backend.')
+            backend = 'python'
+        self.backend = backend
+
+        # Parameterize Agents
+        self.wolf_params = SpeciesParameters(wolf_gain, wolf_reproduce)
+        self.sheep_params = SpeciesParameters(sheep_gain, sheep_reproduce)
+        self.agent_counter = 0
 
         # Add Systems
         self.systemManager.addSystem(MovementSystem('move', self))
-        self.systemManager.addSystem(ResourceConsumptionSystem('food', self, regrow_rate))
+        self.systemManager.addSystem(ResourceConsumptionSystem('food', self, regrow_rate, regrowth))
         self.systemManager.addSystem(BirthSystem('birth', self))
         self.systemManager.addSystem(DeathSystem('death', self))
-        self.systemManager.addSystem(DataCollector('collector', self, image_write))
-
-        # Parameterize Agents
-        Wolf.gain = wolf_gain
-        Sheep.gain = sheep_gain
-
-        Wolf.reproduce_rate = wolf_reproduce
-        Sheep.reproduce_rate = sheep_reproduce
+        self.systemManager.addSystem(DataCollector('collector', self, image_write, async_collection))
 
         # Create Agents at random locations
+        locations = self.rng.stream('setup').integers(size, size=(init_sheep + init_wolf, 2)).tolist()
 
-        for _ in range(init_sheep):
+        for x, y in locations[:init_sheep]:
             self.environment.addAgent(
                 Sheep(self),
-                xPos = self.random.randint(0, size - 1),
-                yPos = self.random.randint(0, size - 1)
+                xPos = x,
+                yPos = y
             )
 
-        for _ in range(init_wolf):
+        for x, y in locations[init_sheep:]:
             self.environment.addAgent(
                 Wolf(self),
-                xPos = self.random.randint(0, size - 1),
-                yPos = self.random.randint(0, size - 1)
+                xPos = x,
+                yPos = y
             )
@@ -0,0 +1,42 @@
+import numpy
+
+# PredatorPreyModel only uses these kernels when NUMBA_AVAILABLE, see Experiments/src/Backends.py
+from Backends import NUMBA_AVAILABLE, jit
+
+
+@jit
+def consume(pos_ids, is_wolf, energy, resources, cell_count, wolf_gain, sheep_gain):
+    """Compiled equivalent of the agent loop of ResourceConsumptionSystem. Agents are processed in the order they are
+    supplied. Every wolf eats the first uneaten sheep that shares its cell and every uneaten sheep grazes its cell if the
+    grass is alive. ``energy`` and ``resources`` are updated in place. Returns the indices of the eaten sheep in the
+    order they were eaten."""
+    agent_count = len(pos_ids)
+
+    # Linked list of the agents in each cell, in agent order
+    head = numpy.full(cell_count, -1, dtype=numpy.int64)
+    next_agent = numpy.full(agent_count, -1, dtype=numpy.int64)
+    for i in range(agent_count - 1, -1, -1):
+        next_agent[i] = head[pos_ids[i]]
+        head[pos_ids[i]] = i
+
+    eaten = numpy.zeros(agent_count, dtype=numpy.bool_)
+    eaten_order = numpy.empty(agent_count, dtype=numpy.int64)
+    eaten_count = 0
+
+    for i in range(agent_count):
+        if is_wolf[i]:
+            target = head[pos_ids[i]]
+            while target != -1:
+                if not is_wolf[target] and not eaten[target]:
+                    eaten[target] = True
+                    eaten_order[eaten_count] = target
+                    eaten_count += 1
+                    energy[i] += wolf_gain
+                    break
+                target = next_agent[target]
+
+        elif not eaten[i] and resources[pos_ids[i]] > 0:
+            energy[i] += sheep_gain
+            resources[pos_ids[i]] = 0
+
+    return eaten_order[:eaten_count]
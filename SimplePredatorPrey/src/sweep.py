@@ -0,0 +1,209 @@
+import argparse
+import itertools
+import multiprocessing
+import multiprocessing.pool
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Experiments', 'src'))
+
+from PredatorPrey import PredatorPreyModel
+from RunController import RunController, Extinction, Explosion, WallClockBudget
+from Telemetry import Telemetry, PrometheusFilePublisher
+
+# Parameters that can be swept along with the (lower, upper) range used when none is supplied
+PARAMETERS = {
+    'sgain': (1.0, 8.0),
+    'wgain': (5.0, 40.0),
+    'srepro': (0.01, 0.1),
+    'wrepro': (0.01, 0.1),
+    'grow': (5, 60),
+}
+
+INTEGER_PARAMETERS = ['grow']
+
+
+def grid_design(ranges: dict, steps: int) -> [dict]:
+    """Returns every combination of ``steps`` evenly spaced values for each parameter in ``ranges``. Parameters whose
+    range is a single value are held fixed."""
+    axes = [np.linspace(low, high, steps) if low != high else [low] for low, high in ranges.values()]
+    return [dict(zip(ranges.keys(), values)) for values in itertools.product(*axes)]
+
+
+def latin_hypercube_design(ranges: dict, samples: int, seed: int) -> [dict]:
+    """Returns ``samples`` points drawn from a Latin hypercube spanning ``ranges``. Each parameter's range is split
+    into ``samples`` strata and every stratum is sampled exactly once."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in ranges.items():
+        strata = (rng.permutation(samples) + rng.random(samples)) / samples
+        columns[name] = low + strata * (high - low)
+
+    return [{name: columns[name][i] for name in ranges} for i in range(samples)]
+
+
+def dominant_period(series: np.ndarray) -> float:
+    """Returns the lag of the first autocorrelation peak of ``series`` or NaN if the series does not oscillate."""
+    centered = series - series.mean()
+    if len(centered) < 4 or not centered.any():
+        return float('nan')
+
+    spectrum = np.fft.rfft(centered, n=2 * len(centered))
+    autocorrelation = np.fft.irfft(spectrum * np.conj(spectrum))[:len(centered)]
+
+    # The first peak after the autocorrelation crosses zero is the period of the oscillation
+    crossings = np.nonzero(autocorrelation < 0)[0]
+    if len(crossings) == 0:
+        return float('nan')
+
+    tail = autocorrelation[crossings[0]:]
+    peak = crossings[0] + int(np.argmax(tail))
+    return float(peak) if tail.max() > 0 else float('nan')
+
+
+def summarise(records: dict, reason: str, burn_in: float) -> dict:
+    """Classifies a run by the reason it stopped and measures the oscillations of the populations after the burn-in
+    period."""
+    sheep = np.asarray(records['sheep'])
+    wolves = np.asarray(records['wolves'])
+
+    outcome = 'coexistence' if reason == 'completed' else reason
+    settled = slice(int(len(sheep) * burn_in), None)
+
+    return {
+        'outcome': outcome,
+        'coexistence': outcome == 'coexistence',
+        'steps': len(sheep),
+        'period': dominant_period(sheep[settled]) if outcome == 'coexistence' else float('nan'),
+        'sheep_amplitude': (sheep[settled].max() - sheep[settled].min()) / 2.0,
+        'wolf_amplitude': (wolves[settled].max() - wolves[settled].min()) / 2.0,
+        'final_sheep': int(sheep[-1]),
+        'final_wolves': int(wolves[-1])
+    }
+
+
+def run_point(job: dict) -> dict:
+    """Runs a single point of the sweep. Runs stop as soon as either species dies out or the total population grows
+    beyond the explosion threshold. If a telemetry directory was supplied, the progress of the run is written to
+    ``point-<index>.prom`` in that directory."""
+    point = job['point']
+    model = PredatorPreyModel(
+        job['size'],
+        job['sheep'],
+        job['wolf'],
+        int(point['grow']),
+        point['sgain'],
+        point['wgain'],
+        point['srepro'],
+        point['wrepro'],
+        job['seed'],
+        False)
+
+    records = model.systemManager.systems['collector'].records
+
+    conditions = [
+        Explosion(lambda m: records['sheep'][-1] + records['wolves'][-1], job['explosion']),
+        Extinction(lambda m: records['sheep'][-1], 'sheep'),
+        Extinction(lambda m: records['wolves'][-1], 'wolves')
+    ]
+    if job['budget'] is not None:
+        conditions.append(WallClockBudget(job['budget']))
+
+    telemetry = None
+    if job['telemetry'] is not None:
+        path = os.path.join(job['telemetry'], 'point-{}.prom'.format(job['index']))
+        labels = dict({'point': job['index']}, **{name: value for name, value in point.items()})
+        gauges = {'sheep': lambda m: records['sheep'][-1], 'wolves': lambda m: records['wolves'][-1]}
+        telemetry = Telemetry([PrometheusFilePublisher(path)], job['iterations'], job['telemetry_interval'], gauges,
+                              labels)
+        telemetry.attach(model)
+
+    controller = RunController(model, job['iterations'], conditions,
+                               callback=telemetry.step if telemetry is not None else None)
+    controller.run()
+    if telemetry is not None:
+        telemetry.close()
+
+    result = dict(point)
+    result.update(summarise(records, controller.reason, job['burn_in']))
+    return result
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--design', help='Sampling design of the sweep.', default='grid', choices=['grid', 'lhs'])
+    parser.add_argument('--steps', help='Number of grid values per parameter.', default=3, type=int)
+    parser.add_argument('--samples', help='Number of Latin hypercube samples.', default=100, type=int)
+    for name, (low, high) in PARAMETERS.items():
+        parser.add_argument('--{}'.format(name), help='Range of {} to sweep.'.format(name), nargs=2,
+                            default=[low, high], type=float, metavar=('LOW', 'HIGH'))
+    parser.add_argument('-s', '--size', help='Size of the environment.', default=50, type=int)
+    parser.add_argument('--sheep', help='Number of initial Sheep.', default=100, type=int)
+    parser.add_argument('--wolf', help='Number of initial Wolves.', default=50, type=int)
+    parser.add_argument('--iterations', help='Length of Simulation.', default=1000, type=int)
+    parser.add_argument('--explosion', help='Total population at which a run is stopped.', default=10000, type=int)
+    parser.add_argument('--burn-in', help='Fraction of each run ignored when measuring oscillations.', default=0.25,
+                        type=float)
+    parser.add_argument('--budget', help='Wall-clock budget of each run in seconds.', default=None, type=float)
+    parser.add_argument('--seed', help='Seed of random number generator.', default=345968, type=int)
+    parser.add_argument('--workers', help='Number of worker processes.', default=multiprocessing.cpu_count(),
+                        type=int)
+    parser.add_argument('--threads', help='Run the workers as threads of this process instead of processes.',
+                        action='store_true')
+    parser.add_argument('--telemetry', help='Directory the telemetry of every point is written to.', default=None,
+                        type=str)
+    parser.add_argument('--telemetry-interval', help='Seconds between telemetry samples.', default=5.0, type=float)
+    parser.add_argument('-o', '--output', help='Path of the outcome table.', default='sweep.csv', type=str)
+
+    parser = parser.parse_args()
+
+    ranges = {name: tuple(getattr(parser, name)) for name in PARAMETERS}
+
+    if parser.design == 'grid':
+        points = grid_design(ranges, parser.steps)
+    else:
+        points = latin_hypercube_design(ranges, parser.samples, parser.seed)
+
+    for point in points:
+        for name in INTEGER_PARAMETERS:
+            point[name] = int(round(point[name]))
+
+    jobs = [{
+        'point': point,
+        'size': parser.size,
+        'sheep': parser.sheep,
+        'wolf': parser.wolf,
+        'iterations': parser.iterations,
+        'explosion': parser.explosion,
+        'burn_in': parser.burn_in,
+        'budget': parser.budget,
+        'seed': parser.seed,
+        'index': index,
+        'telemetry': parser.telemetry,
+        'telemetry_interval': parser.telemetry_interval
+    } for index, point in enumerate(points)]
+
+    if parser.telemetry is not None:
+        os.makedirs(parser.telemetry, exist_ok=True)
+
+    print('Running {} points on {} workers...'.format(len(jobs), parser.workers))
+
+    # Models keep their parameters to themselves so the points can also share a single process
+    pool_type = multiprocessing.pool.ThreadPool if parser.threads else multiprocessing.Pool
+
+    with pool_type(parser.workers) as pool:
+        results = pool.map(run_point, jobs, chunksize=1)
+
+    table = pd.DataFrame(results)
+    table.to_csv(parser.output, index=False)
+
+    print(table['outcome'].value_counts().to_string())
+    print('...Done! Outcomes written to {}'.format(parser.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""The numba kernels of the predator-prey model must reproduce its python backend exactly for a fixed seed, with both
+ways of regrowing grass."""
+import hashlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.append(os.path.join(os.path.dirname(ROOT), 'Experiments', 'src'))
+
+import PredatorPreyKernels
+from PredatorPrey import PredatorPreyModel
+
+pytestmark = pytest.mark.skipif(not PredatorPreyKernels.NUMBA_AVAILABLE, reason='numba is not installed')
+
+
+def run(backend: str, regrowth: str, steps: int = 150):
+    model = PredatorPreyModel(30, 100, 50, 30, 4, 20, 0.04, 0.06, 5, False, backend, regrowth=regrowth)
+    for _ in range(steps):
+        model.systemManager.executeSystems()
+
+    records = model.systemManager.systems['collector'].records
+    layers = hashlib.sha1(model.layers['resources'].tobytes() + model.layers['countdown'].tobytes()).hexdigest()
+    return list(records['sheep']), list(records['wolves']), layers
+
+
+@pytest.mark.parametrize('regrowth', ['countdown', 'wheel'])
+def test_numba_matches_python(regrowth):
+    assert run('numba', regrowth) == run('python', regrowth)